@@ -1,8 +1,13 @@
 """batterway."""
 
+import logging
+
 __all__ = (
     "__version__",
     # Add functions and variables you want exposed in `batterway.` namespace here
 )
 
 __version__ = "0.0.1"
+
+# Library logging stays silent unless the application configures a handler
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,165 @@
+"""Compact, array-backed bills of materials sharing one product index."""
+
+from collections.abc import Iterable, Iterator, Mapping
+
+import numpy as np
+
+from batterway.datamodel.generic.product import BoM, Product, ProductInstance, Quantity
+
+
+class ProductIndex:
+    """Append-only table giving every product a fixed position in quantity vectors."""
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self.products: list[Product] = []
+        self.positions: dict[Product, int] = {}
+        self.__name_to_product: dict[str, Product] = {}
+        for product in products:
+            self.add(product)
+
+    def add(self, product: Product) -> int:
+        """Position of the product, appending it to the index if needed."""
+        position = self.positions.get(product)
+        if position is None:
+            position = len(self.products)
+            self.products.append(product)
+            self.positions[product] = position
+            self.__name_to_product.setdefault(product.name, product)
+        return position
+
+    def get_product(self, product_name: str) -> Product:
+        return self.__name_to_product[product_name]
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __contains__(self, item: Product | str) -> bool:
+        if isinstance(item, str):
+            return item in self.__name_to_product
+        return item in self.positions
+
+
+class _ProductQuantitiesView(Mapping):
+    """Read-only dict-like view of an ArrayBoM, building ProductInstance objects only when they are accessed."""
+
+    def __init__(self, array_bom: "ArrayBoM"):
+        self.__array_bom = array_bom
+
+    def __getitem__(self, product: Product) -> ProductInstance:
+        if product not in self.__array_bom:
+            raise KeyError(product)
+        position = self.__array_bom.index.positions[product]
+        qty = float(self.__array_bom.quantities[position])
+        return ProductInstance(product, Quantity(qty, product.reference_quantity.unit))
+
+    def __iter__(self) -> Iterator[Product]:
+        products = self.__array_bom.index.products
+        return (products[i] for i in np.flatnonzero(self.__array_bom.present))
+
+    def __len__(self) -> int:
+        return int(self.__array_bom.present.sum())
+
+
+class ArrayBoM:
+    """A Bill of Materials stored as a float64 quantity vector over a shared ProductIndex.
+
+    Quantities are expressed in the reference unit of each product. A boolean mask records which products are part of
+    the BoM, so that explicit zero quantities stay distinguishable from absent products, as in BoM.
+    """
+
+    def __init__(self, index: ProductIndex, quantities: np.ndarray, present: np.ndarray | None = None):
+        self.index: ProductIndex = index
+        self.quantities: np.ndarray = np.asarray(quantities, dtype=np.float64)
+        self.present: np.ndarray = self.quantities != 0 if present is None else np.asarray(present, dtype=bool)
+
+    @classmethod
+    def from_bom(cls, bom: BoM, index: ProductIndex) -> "ArrayBoM":
+        positions, values = [], []
+        for product, p_instance in bom.product_quantities.items():
+            if p_instance.qty.unit != product.reference_quantity.unit:
+                unit_name = product.reference_quantity.unit.name
+                err_msg = f"Quantity of {product.name} is not in its reference unit {unit_name}"
+                raise ValueError(err_msg)
+            positions.append(index.add(product))
+            values.append(p_instance.qty.value)
+        quantities = np.zeros(len(index))
+        quantities[positions] = values
+        present = np.zeros(len(index), dtype=bool)
+        present[positions] = True
+        return cls(index, quantities, present)
+
+    def to_bom(self) -> BoM:
+        return BoM(dict(self.product_quantities.items()))
+
+    @property
+    def product_quantities(self) -> Mapping[Product, ProductInstance]:
+        self._align(len(self.index))
+        return _ProductQuantitiesView(self)
+
+    @property
+    def products(self) -> list[Product]:
+        return list(self.product_quantities)
+
+    @property
+    def quantity_total(self) -> float:
+        return float(self.quantities.sum())
+
+    def set_quantity_of_product(self, product_name: str, qty: float) -> None:
+        """Set the quantity of a product of the BoM; like BoM, raises KeyError for a product not in the BoM."""
+        if product_name not in self:
+            raise KeyError(product_name)
+        position = self.index.positions[self.index.get_product(product_name)]
+        self.quantities[position] = qty
+        self.present[position] = True
+
+    def _align(self, size: int) -> None:
+        """Pad the vectors with absent products added to the index since this BoM was built."""
+        missing = size - len(self.quantities)
+        if missing > 0:
+            self.quantities = np.concatenate([self.quantities, np.zeros(missing)])
+            self.present = np.concatenate([self.present, np.zeros(missing, dtype=bool)])
+
+    def __str__(self) -> str:
+        return "\n".join([f"{p.name}: {q}" for p, q in self.product_quantities.items()])
+
+    def __add__(self, other: "ArrayBoM") -> "ArrayBoM":
+        """Add two ArrayBoM objects; like BoM.__add__, only strictly positive quantities are kept."""
+        if not isinstance(other, ArrayBoM):
+            err_msg = f"Can only add ArrayBoM objects together, not {other.__class__.__name__}"
+            raise TypeError(err_msg)
+        if other.index is not self.index:
+            err_msg = "Can only add ArrayBoM objects sharing the same ProductIndex"
+            raise ValueError(err_msg)
+        self._align(len(self.index))
+        other._align(len(self.index))
+        quantities = self.quantities + other.quantities
+        present = (self.present | other.present) & (quantities > 0)
+        return ArrayBoM(self.index, np.where(present, quantities, 0.0), present)
+
+    def __mul__(self, other: "Quantity | float | int") -> "ArrayBoM":
+        """Multiply an ArrayBoM by a Quantity object or a number."""
+        if not isinstance(other, Quantity | float | int):
+            err_msg = (
+                "Can only multiply ArrayBoM objects with int, float, or Quantity objects, "
+                f"not {other.__class__.__name__}"
+            )
+            raise TypeError(err_msg)
+        factor = other.value if isinstance(other, Quantity) else other
+        return ArrayBoM(self.index, self.quantities * factor, self.present.copy())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ArrayBoM) or other.index is not self.index:
+            return False
+        self._align(len(self.index))
+        other._align(len(self.index))
+        return bool(np.array_equal(self.present, other.present) and np.array_equal(self.quantities, other.quantities))
+
+    __hash__ = None
+
+    def __contains__(self, item: Product | ProductInstance | str) -> bool:
+        if isinstance(item, str):
+            item = self.index.get_product(item) if item in self.index else None
+        elif isinstance(item, ProductInstance):
+            item = item.product
+        position = self.index.positions.get(item)
+        return position is not None and position < len(self.present) and bool(self.present[position])
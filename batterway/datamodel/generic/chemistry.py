@@ -0,0 +1,79 @@
+"""Conversion of chemical compound flows into elemental flows, as one matrix product."""
+
+from collections.abc import Iterable, Mapping, Sequence
+
+import numpy as np
+from chempy.util.periodic import names, symbols
+
+from batterway.datamodel.generic.product import BoM, ChemicalCompound, Product, element_mass_fractions
+
+_ELEMENT_NAMES: dict[str, str] = {name.lower(): symbol for name, symbol in zip(names, symbols)}
+
+
+def product_mass_fractions(product: Product, pure_elements: bool = False) -> tuple[tuple[str, float], ...] | None:
+    """Mass fraction of each element in a product, or None when its elemental composition is unknown.
+
+    Chemical compounds are resolved from their formula; with pure_elements, products named after an element (e.g.
+    "Nickel") are taken as that pure element.
+    """
+    if isinstance(product, ChemicalCompound):
+        return element_mass_fractions(product.chemical_formula)
+    if pure_elements and product.name.lower() in _ELEMENT_NAMES:
+        return ((_ELEMENT_NAMES[product.name.lower()], 1.0),)
+    return None
+
+
+class ElementMassFractions:
+    """Compound x element matrix of mass fractions for the chemical compounds among a set of products.
+
+    Row i holds the mass fraction of every element in compound i, so the elemental masses of compound flows q (in the
+    reference unit of each compound) are q @ matrix. Elements are ordered by atomic number; products without a known
+    composition are ignored. With pure_elements, products named after an element are included as that element.
+    """
+
+    def __init__(self, products: Iterable[Product], pure_elements: bool = False):
+        fractions = {}
+        for product in products:
+            fraction = product_mass_fractions(product, pure_elements)
+            if fraction is not None:
+                fractions.setdefault(product, dict(fraction))
+        self.compounds: list[Product] = list(fractions)
+        self.index: dict[Product, int] = {p: i for i, p in enumerate(self.compounds)}
+        present = {elem for fraction in fractions.values() for elem in fraction}
+        self.elements: list[str] = [elem for elem in symbols if elem in present]
+        element_index = {elem: j for j, elem in enumerate(self.elements)}
+
+        self.matrix: np.ndarray = np.zeros((len(self.compounds), len(self.elements)))
+        for i, fraction in enumerate(fractions.values()):
+            for elem, share in fraction.items():
+                self.matrix[i, element_index[elem]] = share
+
+    def __len__(self) -> int:
+        return len(self.compounds)
+
+    def rows(self, products: Sequence[Product]) -> np.ndarray:
+        """(products x elements) mass fractions of the given products, with zero rows for those not in the matrix."""
+        rows = np.zeros((len(products), len(self.elements)))
+        positions = [(i, self.index[p]) for i, p in enumerate(products) if p in self.index]
+        if positions:
+            targets, sources = zip(*positions)
+            rows[list(targets)] = self.matrix[list(sources)]
+        return rows
+
+    def compound_vector(self, flows: BoM | Mapping[Product, float]) -> np.ndarray:
+        """Quantities of the compounds in a BoM or a product to quantity mapping, as a vector over compounds."""
+        quantities = np.zeros(len(self.compounds))
+        items = flows.product_quantities.items() if isinstance(flows, BoM) else flows.items()
+        for product, qty in items:
+            position = self.index.get(product)
+            if position is not None:
+                quantities[position] = qty.qty.value if isinstance(flows, BoM) else qty
+        return quantities
+
+    def elemental_flows(self, quantities: np.ndarray) -> np.ndarray:
+        """Elemental masses of compound quantities, for a vector or a (scenarios x compounds) array."""
+        return np.asarray(quantities, dtype=np.float64) @ self.matrix
+
+    def elemental_bom(self, flows: BoM | Mapping[Product, float]) -> dict[str, float]:
+        """Mass of each element contained in the compounds of a BoM or a product to quantity mapping."""
+        return dict(zip(self.elements, self.elemental_flows(self.compound_vector(flows)).tolist()))
@@ -0,0 +1,127 @@
+"""Memoized flattening of product BoMs into their raw materials."""
+
+import threading
+import weakref
+from collections.abc import Iterable
+
+from batterway.datamodel.generic.product import BoM, Product, ProductInstance, Quantity, Unit
+from batterway.instrumentation import stage_timer
+
+
+def topological_order(products: Iterable[Product]) -> list[Product]:
+    """Order the given products and all their sub-products so that every product comes after its sub-products.
+
+    Raises a ValueError if the BoM graph contains a cycle.
+    """
+    order: list[Product] = []
+    done: set[Product] = set()
+    in_progress: set[Product] = set()
+    for root in products:
+        if root in done:
+            continue
+        stack = [(root, _children(root))]
+        in_progress.add(root)
+        while stack:
+            product, children = stack[-1]
+            for child in children:
+                if child in in_progress:
+                    cycle = [p.name for p, _ in stack[[p for p, _ in stack].index(child) :]] + [child.name]
+                    err_msg = f"Cycle detected in BoM graph: {' -> '.join(cycle)}"
+                    raise ValueError(err_msg)
+                if child not in done:
+                    in_progress.add(child)
+                    stack.append((child, _children(child)))
+                    break
+            else:
+                stack.pop()
+                in_progress.discard(product)
+                done.add(product)
+                order.append(product)
+    return order
+
+
+def _children(product: Product) -> Iterable[Product]:
+    return iter(product.bom.product_quantities) if product.bom is not None else iter(())
+
+
+class BoMFlattener:
+    """Computes final BoMs once per product and keeps them until a product BoM changes.
+
+    The cache holds, for every product with a BoM, the raw material quantities needed for one reference quantity of
+    that product, with the closure revision of the product (see Product.bom_closure_revision). Reassigning or editing
+    a BoM in place thus only recomputes the products that reach it. Filling and reading the cache is serialized by a
+    lock, so that one flattener can be shared by threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._final: weakref.WeakKeyDictionary[Product, tuple[int, dict[Product, tuple[float, Unit]]]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def invalidate(self) -> None:
+        """Drop every cached final BoM."""
+        with self._lock:
+            self._final.clear()
+
+    def final_quantities(self, product: Product) -> dict[Product, tuple[float, Unit]]:
+        """Raw material quantities (value, unit) for one reference quantity of a product with a BoM."""
+        with self._lock:
+            self._ensure([product])
+            return self._final[product][1]
+
+    def final_bom(self, product: Product, factor: float = 1.0) -> BoM:
+        """Final BoM of a product, scaled by factor."""
+        if product.bom is None:  # Within the model, this means the product is a raw material
+            return BoM({product: ProductInstance(product, product.reference_quantity * factor)})
+        with stage_timer.measure("flattening"):
+            final_quantities = self.final_quantities(product)
+        with stage_timer.measure("bom_construction"):
+            return self._to_bom(final_quantities, factor)
+
+    def flatten(self, bom: BoM, factor: float = 1.0) -> BoM:
+        """Flatten a BoM that does not belong to a product (e.g. the inputs of a process)."""
+        with stage_timer.measure("flattening"):
+            with self._lock:
+                self._ensure(bom.product_quantities)
+                final_quantities = self._accumulate(bom)
+        with stage_timer.measure("bom_construction"):
+            return self._to_bom(final_quantities, factor)
+
+    def _ensure(self, products: Iterable[Product]) -> None:
+        """Fill the cache for the given products and their sub-products, in topological order."""
+        missing = [p for p in products if p.bom is not None and not self._is_current(p)]
+        if not missing:
+            return
+        for sub_product in topological_order(missing):
+            if sub_product.bom is not None and not self._is_current(sub_product):
+                self._final[sub_product] = (sub_product.bom_closure_revision(), self._accumulate(sub_product.bom))
+
+    def _is_current(self, product: Product) -> bool:
+        cached = self._final.get(product)
+        return cached is not None and cached[0] == product.bom_closure_revision()
+
+    def _accumulate(self, bom: BoM) -> dict[Product, tuple[float, Unit]]:
+        totals: dict[Product, tuple[float, Unit]] = {}
+        for product, p_instance in bom.product_quantities.items():
+            if product.bom is None:
+                contributions = [(product, p_instance.qty.value, p_instance.qty.unit)]
+            else:
+                scale = p_instance.qty.value
+                contributions = [(raw, value * scale, unit) for raw, (value, unit) in self._final[product][1].items()]
+            for raw, value, unit in contributions:
+                if raw in totals:
+                    totals[raw] = (totals[raw][0] + value, totals[raw][1])
+                else:
+                    totals[raw] = (value, unit)
+        # Same convention as BoM.__add__, which only keeps strictly positive quantities
+        return {raw: (value, unit) for raw, (value, unit) in totals.items() if value > 0}
+
+    @staticmethod
+    def _to_bom(quantities: dict[Product, tuple[float, Unit]], factor: float) -> BoM:
+        return BoM(
+            {raw: ProductInstance(raw, Quantity(value * factor, unit)) for raw, (value, unit) in quantities.items()}
+        )
+
+
+default_flattener = BoMFlattener()
@@ -1,4 +1,26 @@
-from batterway.datamodel.generic.product import BoM, Product, ProductInstance, Quantity, Unit
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from batterway.datamodel.generic.flattening import default_flattener
+from batterway.datamodel.generic.product import (
+    BoM,
+    Product,
+    ProductInstance,
+    Quantity,
+    QuantityVector,
+    Unit,
+    common_unit,
+)
+from batterway.instrumentation import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Serializes the compilation of relations, which fills the shared flattening cache; evaluations themselves take no lock
+_compile_lock = threading.Lock()
 
 
 class ProcessLCI:
@@ -20,6 +42,54 @@ class ProcessLCI:
         )
 
 
+class ProcessResult:
+    """Fixed inputs of one evaluation of a RecyclingProcess and the flows computed from them."""
+
+    def __init__(self, process_name: str, inputs: BoM, computed_input_bom: BoM, computed_output_bom: BoM):
+        self.process_name: str = process_name
+        self.inputs: BoM = inputs
+        self.computed_input_bom: BoM = computed_input_bom
+        self.computed_output_bom: BoM = computed_output_bom
+
+    def __str__(self):
+        return (
+            f"{self.process_name} :\n{self.inputs}\nInput flows:\n{self.computed_input_bom}"
+            f"\nOutput flows:\n{self.computed_output_bom}"
+        )
+
+
+class ProcessJacobian:
+    """Derivatives of the influenced input and output flows of a process or route with respect to its fixed inputs.
+
+    to_input is an (influenced inputs x fixed inputs) and to_output an (influenced outputs x fixed inputs) sparse
+    matrix; fixed quantities x give the flows to_input @ x and to_output @ x.
+    """
+
+    def __init__(
+        self,
+        process_name: str,
+        fixed_inputs: list[Product],
+        input_influenced: list[Product],
+        output_influenced: list[Product],
+        to_input: sparse.csr_matrix,
+        to_output: sparse.csr_matrix,
+    ):
+        self.process_name: str = process_name
+        self.fixed_inputs: list[Product] = fixed_inputs
+        self.input_influenced: list[Product] = input_influenced
+        self.output_influenced: list[Product] = output_influenced
+        self.to_input: sparse.csr_matrix = to_input
+        self.to_output: sparse.csr_matrix = to_output
+
+    def to_frames(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Both matrices as dense DataFrames indexed by product names."""
+        columns = [p.name for p in self.fixed_inputs]
+        return (
+            pd.DataFrame(self.to_input.toarray(), index=[p.name for p in self.input_influenced], columns=columns),
+            pd.DataFrame(self.to_output.toarray(), index=[p.name for p in self.output_influenced], columns=columns),
+        )
+
+
 class Process:
     """A process in a supply chain, represented by its inputs and outputs."""
 
@@ -48,107 +118,347 @@ class RecyclingProcess(Process):
         self.ref_input_to_input_relation: dict[tuple[Product, Product], float] = ref_input_to_input
         self.computed_output_bom: BoM | None = None
         self.computed_input_bom: BoM | None = None
+        self.__compiled: CompiledRelations | None = None
         self.__ensure_coherency()
 
     def __get_input_final_bom(self) -> BoM:
-        return ProductInstance(Product(
-            "dummy", "",
-            Quantity(self.inputs.quantity_total, Unit("kg", "")),
-            self.inputs
-        ),
-            Quantity(1.0, Unit("kg", "")
-                     )
-        ).get_final_bom() + self.inputs
+        return default_flattener.flatten(self.inputs) + self.inputs
 
     def __ensure_coherency(self) -> bool:
         input_final_bom = self.__get_input_final_bom()
         missing_input_influencing_input = [i_rel[0] for i_rel in self.ref_input_to_input_relation if i_rel[0] not in input_final_bom]
         missing_input_influencing_output = [i_rel[0] for i_rel in self.ref_input_to_output_relation if i_rel[0] not in input_final_bom]
         if len(missing_input_influencing_input):
-            print([p.name for p in missing_input_influencing_input])
-            err_msg = "Products influencing the input should be present in the input LCI."
+            err_msg = (
+                "Products influencing the input should be present in the input LCI: "
+                f"{sorted({p.name for p in missing_input_influencing_input})}"
+            )
             raise ValueError(err_msg)
         if any(missing_input_influencing_output):
-            print([p.name for p in missing_input_influencing_input])
-            err_msg = "Products influencing the output should be present in the input LCI."
+            err_msg = (
+                "Products influencing the output should be present in the input LCI: "
+                f"{sorted({p.name for p in missing_input_influencing_output})}"
+            )
             raise ValueError(err_msg)
         return True
 
-    def __update_flow(self) -> None:
-        final_bom = self.__get_input_final_bom()
-        print("#" * 20)
-        print("#" * 3 + "BOM FOR RELATIVE" + "#" * 3)
-        print("#" * 20)
-        print(final_bom)
-        print("#" * 20)
-
-        updated_in_flow_value = dict()
-        updated_in_flow_value = {}
-        for (product_influencing, product_influenced), ratio in self.ref_input_to_input_relation.items():
-            if product_influencing in final_bom:
-                if product_influenced not in updated_in_flow_value:
-                    updated_in_flow_value[product_influenced] = ProductInstance(
-                        product_influenced, Quantity(0, product_influenced.reference_quantity.unit)
+    @property
+    def compiled_relations(self) -> "CompiledRelations":
+        """Relation matrices of the process, recompiled when the BoM of one of its input products has changed."""
+        compiled = self.__compiled
+        if compiled is None or not compiled.is_current():
+            with _compile_lock:
+                compiled = self.__compiled
+                if compiled is None or not compiled.is_current():
+                    compiled = CompiledRelations(
+                        list(self.inputs.product_quantities),
+                        self.ref_input_to_input_relation,
+                        self.ref_input_to_output_relation,
                     )
-                updated_in_flow_value[product_influenced] += (
-                    final_bom.product_quantities[product_influencing].qty * ratio
-                )
-        for product_influenced in updated_in_flow_value:
-            product_influenced.quantity = Quantity(
-                updated_in_flow_value[product_influenced], product_influenced.reference_quantity.unit
-            )
+                    self.__compiled = compiled
+        return compiled
 
-        updated_out_flow_value = {}
-        for (product_influencing, product_influenced), ratio in self.ref_input_to_output_relation.items():
-            if product_influencing in final_bom:
-                if product_influenced not in updated_out_flow_value:
-                    updated_out_flow_value[product_influenced] = ProductInstance(
-                        product_influenced, Quantity(0, product_influenced.reference_quantity.unit)
-                    )
-                updated_out_flow_value[product_influenced] += (
-                    final_bom.product_quantities[product_influencing].qty * ratio
-                )
+    def evaluate(self, products_qty: dict[str, float]) -> "ProcessResult":
+        """Compute the flows of the process for the given fixed inputs, by product name, without modifying anything.
 
-        for product_influenced in updated_out_flow_value:
-            product_influenced.quantity = Quantity(
-                updated_out_flow_value[product_influenced], product_influenced.reference_quantity.unit
+        Inputs left out of products_qty are zero. Neither the process nor its products are changed, so one process can
+        be evaluated concurrently, e.g. from a thread pool serving one loaded Inventory.
+        """
+        if not len(products_qty):
+            raise ValueError("Empty inputs")
+        compiled = self.compiled_relations
+        input_positions = {p.name: i for i, p in enumerate(compiled.input_products)}
+        missing = [name for name in products_qty if name not in input_positions]
+        if missing:
+            err_msg = f"Products {missing} are not inputs of {self.name}"
+            raise ValueError(err_msg)
+        input_qty = np.zeros(len(compiled.input_products))
+        for product_name, qty in products_qty.items():
+            input_qty[input_positions[product_name]] = qty
+        inputs = compiled.to_bom(
+            compiled.input_products, input_qty, np.ones(len(input_qty), dtype=bool), compiled.input_unit
+        )
+        logger.debug("Inputs of %s:\n%s", self.name, inputs)
+
+        with stage_timer.measure("flattening"):
+            flat_qty, flat_present = compiled.flatten(input_qty)
+        if logger.isEnabledFor(logging.DEBUG):
+            flat_bom = compiled.to_bom(compiled.flat_products, flat_qty, flat_present, compiled.flat_unit)
+            logger.debug("Final input BoM of %s:\n%s", self.name, flat_bom)
+        with stage_timer.measure("relation_application"):
+            in_qty, in_present, out_qty, out_present = compiled.apply(flat_qty, flat_present)
+        with stage_timer.measure("bom_construction"):
+            result = ProcessResult(
+                self.name,
+                inputs,
+                compiled.to_bom(compiled.input_influenced, in_qty, in_present, compiled.input_influenced_unit),
+                compiled.to_bom(compiled.output_influenced, out_qty, out_present, compiled.output_influenced_unit),
             )
-
-        self.computed_output_bom = BoM(updated_out_flow_value)
-        self.computed_input_bom = BoM(updated_in_flow_value)
+        logger.debug("Updated input flow of %s:\n%s", self.name, result.computed_input_bom)
+        logger.debug("Updated output flow of %s:\n%s", self.name, result.computed_output_bom)
+        return result
 
     def update_fixed_input_lci(self, products_qty: dict[str, float]) -> None:
+        """Evaluate the process and store the fixed inputs and the computed flows on it.
+
+        Kept for the stateful API; use evaluate when the process is shared.
+        """
         self.computed_output_bom = None
         self.computed_input_bom = None
-        if not len(products_qty):
+        result = self.evaluate(products_qty)
+        for product, qty in zip(result.inputs.products, result.inputs.quantity_values().tolist()):
+            self.inputs.set_quantity_of_product(product.name, qty)
+        self.computed_input_bom = result.computed_input_bom
+        self.computed_output_bom = result.computed_output_bom
+
+    def jacobian(self) -> ProcessJacobian:
+        """Exact derivatives of the computed flows with respect to the fixed input quantities.
+
+        The flows are linear in the flattened inputs, which are linear in the fixed inputs, so the Jacobian is the
+        product of the relation and flattening matrices and does not depend on the scenario. For nonnegative inputs it
+        matches evaluate exactly, a product without any present influencer having a zero flow either way.
+        """
+        compiled = self.compiled_relations
+        flattening = compiled.flattening_matrix
+        return ProcessJacobian(
+            self.name,
+            compiled.input_products,
+            compiled.input_influenced,
+            compiled.output_influenced,
+            (compiled.input_matrix @ flattening).tocsr(),
+            (compiled.output_matrix @ flattening).tocsr(),
+        )
+
+    def feed_array(
+        self, feeds: "pd.DataFrame | np.ndarray", product_names: list[str] | None = None
+    ) -> tuple[np.ndarray, pd.Index | None]:
+        """Scenario feeds as a (scenarios x compiled_relations.input_products) array, and the DataFrame index if any.
+
+        feeds is described in evaluate_batch.
+        """
+        compiled = self.compiled_relations
+        if isinstance(feeds, pd.DataFrame):
+            product_names, values, index = list(feeds.columns), feeds.to_numpy(dtype=np.float64), feeds.index
+        else:
+            values = np.asarray(feeds, dtype=np.float64)
+            product_names = product_names or [p.name for p in compiled.input_products]
+            index = None
+        if values.ndim != 2 or values.shape[1] != len(product_names):
+            err_msg = f"Expected a (scenarios x {len(product_names)}) array of feeds, got shape {values.shape}"
+            raise ValueError(err_msg)
+        if not len(product_names):
             raise ValueError("Empty inputs")
-        for product in self.inputs.products:
-            self.inputs.set_quantity_of_product(product.name, 0)
-
-        for product, qty in products_qty.items():
-            self.inputs.set_quantity_of_product(product, qty)
-        print("#"*20)
-        print("#"*3+"INPUTS"+"#"*3)
-        print(self.inputs)
-
-        self.__update_flow()
-        print("#" * 20)
-        print("#" * 3 + "UPDATED" + "#" * 3)
-        print("#" * 3 + "FLOW" + "#" * 3)
-        print("#" * 20)
-        print("#" * 3 + "INPUT" + "#" * 3)
-        print("#" * 3 + "FLOW" + "#" * 3)
-        print(self.computed_input_bom)
-        print("#" * 20)
-        print("#" * 3 + "OUTPUT" + "#" * 3)
-        print("#" * 3 + "FLOW" + "#" * 3)
-        print(self.computed_output_bom)
 
+        input_positions = {p.name: i for i, p in enumerate(compiled.input_products)}
+        missing = [name for name in product_names if name not in input_positions]
+        if missing:
+            err_msg = f"Products {missing} are not inputs of {self.name}"
+            raise ValueError(err_msg)
+        input_qty = np.zeros((values.shape[0], len(compiled.input_products)))
+        input_qty[:, [input_positions[name] for name in product_names]] = values
+        return input_qty, index
+
+    def evaluate_batch(
+        self, feeds: "pd.DataFrame | np.ndarray", product_names: list[str] | None = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Evaluate many fixed input scenarios at once, without modifying the process.
+
+        feeds is a DataFrame with one column per input product name and one row per scenario, or a 2-D array whose
+        columns follow product_names (by default, the names of the process inputs). Inputs left out of the feed are
+        zero, as in update_fixed_input_lci. Returns the influenced input and output flows as two DataFrames with one
+        row per scenario and one column per influenced product; products without any present influencer are 0.
+        """
+        compiled = self.compiled_relations
+        input_qty, index = self.feed_array(feeds, product_names)
+        with stage_timer.measure("flattening"):
+            flat_qty, flat_present = compiled.flatten(input_qty)
+        with stage_timer.measure("relation_application"):
+            in_qty, in_present, out_qty, out_present = compiled.apply(flat_qty, flat_present)
+        return (
+            pd.DataFrame(
+                np.where(in_present, in_qty, 0.0), index=index, columns=[p.name for p in compiled.input_influenced]
+            ),
+            pd.DataFrame(
+                np.where(out_present, out_qty, 0.0), index=index, columns=[p.name for p in compiled.output_influenced]
+            ),
+        )
 
     def __str__(self):
         return super().__str__()
 
 
+class CompiledRelations:
+    """Relations of a RecyclingProcess compiled into coefficient arrays over the flattened input products.
+
+    The flattened inputs are the final BoM of the inputs plus the inputs themselves, as in the original object-based
+    update. Each relation dict becomes (influenced row, flattened input column, coefficient) arrays kept in relation
+    order, so that np.bincount accumulates every influenced quantity in the same order as the object-based update did.
+    The same arrays are exposed as sparse (influenced x flattened input) matrices for batch evaluation.
+    """
+
+    def __init__(
+        self,
+        input_products: list[Product],
+        ref_input_to_input: dict[tuple[Product, Product], float],
+        ref_input_to_output: dict[tuple[Product, Product], float],
+    ):
+        self.input_products: list[Product] = input_products
+        # Closure revisions of the input products the arrays were compiled from, see is_current
+        self.revisions: list[int] = [product.bom_closure_revision() for product in input_products]
+        self.__checked_revision: int = Product._last_bom_revision
+        flat_index: dict[Product, int] = {}
+        entries = []
+        for col, product in enumerate(input_products):
+            if product.bom is None:
+                entries.append((product, col, 1.0))
+            else:
+                final_quantities = default_flattener.final_quantities(product)
+                entries += [(raw, col, value) for raw, (value, _) in final_quantities.items()]
+        # The inputs themselves are added after their final BoM
+        entries += [(product, col, 1.0) for col, product in enumerate(input_products)]
+        self.flat_rows = np.array([flat_index.setdefault(p, len(flat_index)) for p, _, _ in entries], dtype=np.int64)
+        self.flat_cols = np.array([col for _, col, _ in entries], dtype=np.int64)
+        self.flat_values = np.array([value for _, _, value in entries], dtype=np.float64)
+        self.flat_products: list[Product] = list(flat_index)
+
+        self.input_influenced, self.input_rows, self.input_cols, self.input_values = self.__compile(
+            ref_input_to_input, flat_index
+        )
+        self.output_influenced, self.output_rows, self.output_cols, self.output_values = self.__compile(
+            ref_input_to_output, flat_index
+        )
+        # Reference unit shared by each product list, with which results are built as QuantityVector-backed BoMs
+        self.input_unit: Unit | None = common_unit(input_products)
+        self.flat_unit: Unit | None = common_unit(self.flat_products)
+        self.input_influenced_unit: Unit | None = common_unit(self.input_influenced)
+        self.output_influenced_unit: Unit | None = common_unit(self.output_influenced)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # Unpickled products get new revisions: current arrays are stamped with them, stale ones never match them
+        state["revisions"] = None if self.is_current() else []
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.revisions is None:
+            self.revisions = [product.bom_closure_revision() for product in self.input_products]
+        self.__checked_revision = -1
+
+    def is_current(self) -> bool:
+        """Whether no BoM reached from the input products has changed since compilation."""
+        last_revision = Product._last_bom_revision
+        if self.__checked_revision == last_revision:
+            return True
+        if [product.bom_closure_revision() for product in self.input_products] != self.revisions:
+            return False
+        self.__checked_revision = last_revision
+        return True
+
+    @staticmethod
+    def __compile(
+        relations: dict[tuple[Product, Product], float], flat_index: dict[Product, int]
+    ) -> tuple[list[Product], np.ndarray, np.ndarray, np.ndarray]:
+        influenced_index: dict[Product, int] = {}
+        rows, cols, values = [], [], []
+        for (product_influencing, product_influenced), ratio in relations.items():
+            col = flat_index.get(product_influencing)
+            if col is None:  # Can never be present in the flattened inputs
+                continue
+            rows.append(influenced_index.setdefault(product_influenced, len(influenced_index)))
+            cols.append(col)
+            values.append(ratio.value if isinstance(ratio, Quantity) else ratio)
+        return (
+            list(influenced_index),
+            np.array(rows, dtype=np.int64),
+            np.array(cols, dtype=np.int64),
+            np.array(values, dtype=np.float64),
+        )
+
+    @property
+    def flattening_matrix(self) -> sparse.csr_matrix:
+        """(flattened inputs x inputs) matrix."""
+        shape = (len(self.flat_products), len(self.input_products))
+        return sparse.csr_matrix((self.flat_values, (self.flat_rows, self.flat_cols)), shape=shape)
+
+    @property
+    def input_matrix(self) -> sparse.csr_matrix:
+        """(influenced inputs x flattened inputs) coefficient matrix."""
+        shape = (len(self.input_influenced), len(self.flat_products))
+        return sparse.csr_matrix((self.input_values, (self.input_rows, self.input_cols)), shape=shape)
+
+    @property
+    def output_matrix(self) -> sparse.csr_matrix:
+        """(influenced outputs x flattened inputs) coefficient matrix."""
+        shape = (len(self.output_influenced), len(self.flat_products))
+        return sparse.csr_matrix((self.output_values, (self.output_rows, self.output_cols)), shape=shape)
+
+    @staticmethod
+    def _accumulate(rows: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+        """Sum weights into size bins along the last axis, adding them in the order of rows.
+
+        weights is either a vector or a (scenarios x entries) array. Both loops below add the entries of every bin
+        sequentially in relation order, so a batch row is bit-identical to the single scenario evaluation.
+        """
+        if weights.ndim == 1:
+            return np.bincount(rows, weights=weights, minlength=size)
+        n_scenarios, n_entries = weights.shape
+        if 0 < n_scenarios <= n_entries:
+            return np.stack([np.bincount(rows, weights=w, minlength=size) for w in weights]).reshape(n_scenarios, size)
+        totals = np.zeros((size, n_scenarios))
+        for row, w in zip(rows, np.ascontiguousarray(weights.T)):
+            totals[row] += w
+        return totals.T
+
+    def flatten(self, input_qty: np.ndarray, flat_values: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Flattened input quantities and presence mask; like BoM addition, only positive quantities are present.
+
+        input_qty is a vector over input_products, or a (scenarios x input_products) array. flat_values optionally
+        replaces the flattening coefficients, with one row per scenario (e.g. sampled BoM quantities).
+        """
+        flat_values = self.flat_values if flat_values is None else flat_values
+        flat_qty = self._accumulate(
+            self.flat_rows, flat_values * input_qty[..., self.flat_cols], len(self.flat_products)
+        )
+        flat_present = flat_qty > 0
+        return np.where(flat_present, flat_qty, 0.0), flat_present
+
+    def apply(
+        self,
+        flat_qty: np.ndarray,
+        flat_present: np.ndarray,
+        input_values: np.ndarray | None = None,
+        output_values: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Influenced input and output quantities, with the mask of influenced products having a present influencer.
+
+        input_values and output_values optionally replace the relation coefficients, with one row per scenario.
+        """
+        n_in, n_out = len(self.input_influenced), len(self.output_influenced)
+        input_values = self.input_values if input_values is None else input_values
+        output_values = self.output_values if output_values is None else output_values
+        present = flat_present.astype(np.float64)
+        return (
+            self._accumulate(self.input_rows, flat_qty[..., self.input_cols] * input_values, n_in),
+            self._accumulate(self.input_rows, present[..., self.input_cols], n_in) > 0,
+            self._accumulate(self.output_rows, flat_qty[..., self.output_cols] * output_values, n_out),
+            self._accumulate(self.output_rows, present[..., self.output_cols], n_out) > 0,
+        )
+
+    @staticmethod
+    def to_bom(products: list[Product], qty: np.ndarray, present: np.ndarray, unit: Unit | None = None) -> BoM:
+        """BoM of the present products, from a QuantityVector when they share the reference unit unit."""
+        positions = np.flatnonzero(present)
+        if unit is not None:
+            return BoM.from_vector([products[i] for i in positions], QuantityVector(qty[positions], unit))
+        return BoM(
+            {
+                products[i]: ProductInstance(products[i], Quantity(float(qty[i]), products[i].reference_quantity.unit))
+                for i in positions
+            }
+        )
+
+
 class Route:
     """A sequence of processes in a supply chain."""
 
@@ -193,3 +503,66 @@ class RecyclingRoute:
                     raise ValueError(err_msg)
             output_products = [f.product for f in process.outputs]
             previous_process = process
+
+    def run(self, products_qty: dict[str, float]) -> list[ProcessResult]:
+        """Evaluate the processes in sequence and return the result of each one, without modifying them.
+
+        products_qty feeds the first process; each following process is fed with the computed outputs of the previous
+        one that are among its inputs.
+        """
+        if not len(self.process_sequence):
+            err_msg = f"Route {self.route_id} has no process"
+            raise ValueError(err_msg)
+        results: list[ProcessResult] = []
+        for process in self.process_sequence:
+            if len(results):
+                outputs = results[-1].computed_output_bom
+                products_qty = {
+                    product.name: qty
+                    for product, qty in zip(outputs.products, outputs.quantity_values().tolist())
+                    if product in process.inputs
+                }
+                if not len(products_qty):
+                    err_msg = f"No product produced by {results[-1].process_name} used by {process.name}"
+                    raise ValueError(err_msg)
+            results.append(process.evaluate(products_qty))
+        return results
+
+    def jacobian(self) -> list[ProcessJacobian]:
+        """Derivatives of the flows of every process with respect to the fixed inputs of the first one.
+
+        Each process is fed with the outputs of the previous one that are among its inputs, as in run, so the
+        Jacobian of process k is its own Jacobian chained with those of the processes before it.
+        """
+        if not len(self.process_sequence):
+            err_msg = f"Route {self.route_id} has no process"
+            raise ValueError(err_msg)
+        jacobians: list[ProcessJacobian] = []
+        chain = None  # Derivatives of the fixed inputs of the current process with respect to the route feed
+        for process in self.process_sequence:
+            own = process.jacobian()
+            if len(jacobians):
+                previous = jacobians[-1]
+                output_positions = {p: j for j, p in enumerate(previous.output_influenced)}
+                chained = [(i, output_positions[p]) for i, p in enumerate(own.fixed_inputs) if p in output_positions]
+                if not len(chained):
+                    err_msg = f"No product produced by {previous.process_name} used by {process.name}"
+                    raise ValueError(err_msg)
+                rows, cols = zip(*chained)
+                shape = (len(own.fixed_inputs), len(previous.output_influenced))
+                selection = sparse.csr_matrix((np.ones(len(chained)), (rows, cols)), shape=shape)
+                chain = (selection @ previous.to_output).tocsr()
+            if chain is None:
+                jacobians.append(own)
+            else:
+                jacobians.append(
+                    ProcessJacobian(
+                        process.name,
+                        jacobians[0].fixed_inputs,
+                        own.input_influenced,
+                        own.output_influenced,
+                        (own.to_input @ chain).tocsr(),
+                        (own.to_output @ chain).tocsr(),
+                    )
+                )
+        return jacobians
@@ -1,7 +1,11 @@
 """generic data model classes for products, quantities, and bills of materials."""
 
 from collections import Counter
+from collections.abc import Iterable
+from functools import lru_cache
+from itertools import count
 
+import numpy as np
 from chempy import Substance
 from chempy.util.periodic import relative_atomic_masses, symbols
 from rdflib import URIRef
@@ -9,16 +13,47 @@ from sentier_data_tools.iri import ProductIRI, UnitIRI
 
 
 class Unit:
-    """A unit of measurement with sentier.dev URI."""
+    """A unit of measurement with sentier.dev URI.
+
+    Units are immutable, so that Unit.intern can share one object per name and IRI between all the quantities of all
+    the inventories of a process. The UnitIRI is only built on first access.
+    """
+
+    __slots__ = ("name", "_iri")
+    _interned: dict[tuple[str, str | None], "Unit"] = {}
 
     def __init__(self, name: str, iri: str):
-        self.name = name
-        self.iri = UnitIRI(iri)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "_iri", iri)
+
+    @classmethod
+    def intern(cls, name: str, iri: str | None) -> "Unit":
+        """The shared unit of a name and IRI, created on first request."""
+        unit = cls._interned.get((name, iri))
+        if unit is None:
+            unit = cls._interned.setdefault((name, iri), cls(name, iri))
+        return unit
+
+    @property
+    def iri(self) -> UnitIRI | None:
+        if self._iri is not None and not isinstance(self._iri, UnitIRI):
+            object.__setattr__(self, "_iri", UnitIRI(self._iri))
+        return self._iri
+
+    def __setattr__(self, name: str, value: object) -> None:
+        err_msg = f"Unit {self.name} is immutable"
+        raise AttributeError(err_msg)
+
+    def __reduce__(self):
+        # Unpickled units are interned, so that snapshots and worker processes share them as well
+        return Unit.intern, (self.name, self._iri if self._iri is None else str(self._iri))
 
 
 class Quantity:
     """A quantity with a unit of measurement."""
 
+    __slots__ = ("value", "unit")
+
     def __init__(self, value: float, unit: Unit):
         self.value: float = value
         self.unit: Unit = unit
@@ -44,6 +79,11 @@ class Quantity:
         return False
 
     def __add__(self, other: "Quantity | float | int") -> "Quantity":
+        # Fast paths for the usual operands, skipping the generic checks below
+        if other.__class__ is Quantity and other.unit is self.unit:
+            return Quantity(self.value + other.value, self.unit)
+        if other.__class__ is float or other.__class__ is int:
+            return Quantity(self.value + other, self.unit)
         if self._compatibility_check(other):
             if isinstance(other, Quantity):
                 return Quantity(self.value + other.value, self.unit)
@@ -57,6 +97,10 @@ class Quantity:
         return self.__add__(other)
 
     def __sub__(self, other: "Quantity | float | int") -> "Quantity":
+        if other.__class__ is Quantity and other.unit is self.unit:
+            return Quantity(self.value - other.value, self.unit)
+        if other.__class__ is float or other.__class__ is int:
+            return Quantity(self.value - other, self.unit)
         if self._compatibility_check(other):
             if isinstance(other, Quantity):
                 return Quantity(self.value - other.value, self.unit)
@@ -65,6 +109,10 @@ class Quantity:
         return None
 
     def __mul__(self, other: "Quantity | float | int") -> "Quantity":
+        if other.__class__ is Quantity and other.unit is self.unit:
+            return Quantity(self.value * other.value, self.unit)
+        if other.__class__ is float or other.__class__ is int:
+            return Quantity(self.value * other, self.unit)
         if self._compatibility_check(other):
             if isinstance(other, Quantity):
                 return Quantity(self.value * other.value, self.unit)
@@ -73,6 +121,10 @@ class Quantity:
         return None
 
     def __gt__(self, other: "Quantity | float | int") -> bool:
+        if other.__class__ is Quantity and other.unit is self.unit:
+            return self.value > other.value
+        if other.__class__ is float or other.__class__ is int:
+            return self.value > other
         if self._compatibility_check(other):
             if isinstance(other, Quantity):
                 return self.value > other.value
@@ -84,50 +136,252 @@ class Quantity:
         return f"{round(self.value, 5)} {self.unit.name}"
 
 
+class QuantityVector:
+    """Quantities sharing one unit, as a float64 array.
+
+    Arithmetic checks the units once per operation, whatever the length of the vectors, and works on the whole array.
+    Operands are QuantityVector or Quantity objects of the same unit, numbers or arrays of matching shape.
+    """
+
+    __slots__ = ("values", "unit")
+
+    def __init__(self, values: "np.ndarray | list[float]", unit: Unit):
+        self.values: np.ndarray = np.asarray(values, dtype=np.float64)
+        self.unit: Unit = unit
+
+    @classmethod
+    def from_quantities(cls, quantities: "list[Quantity]", unit: Unit | None = None) -> "QuantityVector":
+        """Vector of Quantity objects, which must all be in unit, by default the unit of the first one."""
+        if unit is None:
+            if not len(quantities):
+                raise ValueError("The unit of an empty vector must be given")
+            unit = quantities[0].unit
+        if any(q.unit is not unit for q in quantities):
+            units = sorted({q.unit.name for q in quantities})
+            err_msg = f"Quantities in units {units} cannot form a vector in {unit.name}"
+            raise ValueError(err_msg)
+        return cls(np.fromiter((q.value for q in quantities), dtype=np.float64, count=len(quantities)), unit)
+
+    def _operand(self, other: "QuantityVector | Quantity | np.ndarray | float | int") -> "np.ndarray | float":
+        if isinstance(other, QuantityVector | Quantity):
+            if other.unit is not self.unit:
+                err_msg = f"Units {self.unit.name} and {other.unit.name} are not compatible"
+                raise ValueError(err_msg)
+            return other.values if isinstance(other, QuantityVector) else other.value
+        if isinstance(other, np.ndarray | float | int):
+            return other
+        err_msg = f"QuantityVector is not compatible with {other.__class__.__name__}"
+        raise TypeError(err_msg)
+
+    def __add__(self, other: "QuantityVector | Quantity | np.ndarray | float | int") -> "QuantityVector":
+        return QuantityVector(self.values + self._operand(other), self.unit)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: "QuantityVector | Quantity | np.ndarray | float | int") -> "QuantityVector":
+        return QuantityVector(self.values - self._operand(other), self.unit)
+
+    def __mul__(self, other: "QuantityVector | Quantity | np.ndarray | float | int") -> "QuantityVector":
+        return QuantityVector(self.values * self._operand(other), self.unit)
+
+    __rmul__ = __mul__
+
+    def __gt__(self, other: "QuantityVector | Quantity | np.ndarray | float | int") -> np.ndarray:
+        return self.values > self._operand(other)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, QuantityVector):
+            return False
+        return other.unit is self.unit and np.array_equal(self.values, other.values)
+
+    __hash__ = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, key: "int | slice | np.ndarray") -> "Quantity | QuantityVector":
+        if isinstance(key, int | np.integer):
+            return Quantity(float(self.values[key]), self.unit)
+        return QuantityVector(self.values[key], self.unit)
+
+    def sum(self) -> Quantity:
+        return Quantity(float(self.values.sum()), self.unit)
+
+    def __str__(self) -> str:
+        return f"{self.values} {self.unit.name}"
+
+
+def common_unit(products: "Iterable[Product]") -> Unit | None:
+    """Reference unit shared by all the products, None when they have several (or none)."""
+    units = {id(p.reference_quantity.unit): p.reference_quantity.unit for p in products}
+    return next(iter(units.values())) if len(units) == 1 else None
+
+
+# Source of the BoM revisions, unique and increasing within a process
+_bom_revisions = count(1)
+
+
 class Product:
-    """A product with a name, sentier.dev ProductIRI, reference quantity and a BoM."""
+    """A product with a name, sentier.dev ProductIRI, reference quantity and a BoM.
+
+    Every product carries the revision of its BoM, renewed whenever the BoM is reassigned or edited in place, so that
+    caches built from a BoM can be checked product by product instead of being dropped on any change.
+    """
+
+    # __weakref__ lets the flattener cache final BoMs without keeping products alive
+    __slots__ = ("name", "_iri", "reference_quantity", "_bom", "_bom_revision", "_closure_revision", "__weakref__")
+    # Revision of the latest BoM change of any product: while it is unchanged, no cached revision can be stale
+    _last_bom_revision: int = 0
 
     def __init__(self, name: str, iri: str, reference_quantity: Quantity, bom: "BoM | None" = None):
         self.name: str = name
-        self.iri: ProductIRI = ProductIRI(iri)
+        # IRI string, replaced by its ProductIRI on first access
+        self._iri: str | ProductIRI = iri
         self.reference_quantity: Quantity = reference_quantity
-        self.bom: BoM = bom
+        self._bom: BoM | None = bom
+        # (_last_bom_revision when computed, result) of bom_closure_revision
+        self._closure_revision: tuple[int, int] | None = None
+        self._renew_bom_revision()
+        if bom is not None:
+            bom._owner = self
 
         # Check that the sum of quantities in the BoM is equal to the reference quantity
         if bom is not None and self.bom.quantity_total != reference_quantity:
             err_msg = f"Sum of quantities in BoM ({self.bom.quantity_total}) is not equal to reference quantity ({reference_quantity})"
             raise ValueError(err_msg)
 
+    @property
+    def iri(self) -> ProductIRI:
+        if not isinstance(self._iri, ProductIRI):
+            self._iri = ProductIRI(self._iri)
+        return self._iri
+
+    @property
+    def bom(self) -> "BoM | None":
+        return self._bom
+
+    @bom.setter
+    def bom(self, bom: "BoM | None") -> None:
+        if bom is not None:
+            bom._owner = self
+        self._bom = bom
+        self._renew_bom_revision()
+
+    def _renew_bom_revision(self) -> None:
+        self._bom_revision = Product._last_bom_revision = next(_bom_revisions)
+
+    def bom_closure_revision(self) -> int:
+        """Latest revision of the BoM of this product and of the BoMs of all its sub-products.
+
+        As revisions only increase, the result changes whenever a BoM anywhere below the product changes. It is kept
+        until the next BoM change of any product, and then computed again once for every product of the closure.
+        """
+        last_revision = Product._last_bom_revision
+        if self._closure_revision is not None and self._closure_revision[0] == last_revision:
+            return self._closure_revision[1]
+        from batterway.datamodel.generic.flattening import topological_order
+
+        # Sub-products come first, so that their closure revision is known when their parents need it
+        for product in topological_order([self]):
+            if product._closure_revision is None or product._closure_revision[0] != last_revision:
+                sub_products = product._bom.products if product._bom is not None else ()
+                revision = max([product._bom_revision, *(p._closure_revision[1] for p in sub_products)])
+                product._closure_revision = (last_revision, revision)
+        return self._closure_revision[1]
+
+    def __getstate__(self) -> dict:
+        # Revisions are only comparable within one process, an unpickled product gets a new one
+        slots = object.__getstate__(self)[1]
+        slots.pop("_bom_revision", None)
+        slots.pop("_closure_revision", None)
+        return slots
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        self._closure_revision = None
+        self._renew_bom_revision()
+
     def __str__(self):
         bom_str = str(self.bom) if self.bom else ""
         return f"{self.name}"
 
     def get_final_bom(self) -> "BoM":
-        final_bom = BoM({self: ProductInstance(self,self.reference_quantity)})
-        if self.bom:
-            final_bom = BoM({})
-            for product, p_instance in self.bom.product_quantities.items():
-                if product.bom is None:  # Within the model, this means the product is a raw material
-                    final_bom += BoM({product: p_instance})
-                else:
-                    final_bom += product.get_final_bom() * p_instance.qty
-        return final_bom
+        from batterway.datamodel.generic.flattening import default_flattener
+
+        return default_flattener.final_bom(self)
 
 
 class BoM:
-    """A Bill of Materials with a dictionary of products and quantities."""
+    """A Bill of Materials with a dictionary of products and quantities.
+
+    A BoM built with from_vector keeps its quantities as a QuantityVector and only creates the ProductInstance
+    objects of product_quantities when they are accessed; totals, scaling and to_vector then work on the array.
+    """
 
     def __init__(self, product_quantities: dict[Product, "ProductInstance"]):
-        self.product_quantities: dict[Product, "ProductInstance"] =  product_quantities
-        self.products = [p.product for p in product_quantities.values()]
+        self.__product_quantities: dict[Product, ProductInstance] | None = product_quantities
+        self.__vector: QuantityVector | None = None
+        self.__index([p.product for p in product_quantities.values()])
+
+    @classmethod
+    def from_vector(cls, products: list[Product], vector: QuantityVector) -> "BoM":
+        """BoM of products with the quantities of vector, in the same order."""
+        if len(products) != len(vector):
+            err_msg = f"{len(products)} products for {len(vector)} quantities"
+            raise ValueError(err_msg)
+        bom = cls.__new__(cls)
+        bom.__product_quantities = None
+        bom.__vector = vector
+        bom.__index(list(products))
+        return bom
+
+    def __index(self, products: list[Product]) -> None:
+        self.products = products
+        # Hashed indexes backing __contains__, set_quantity_of_product only replaces quantities so they stay valid
+        self.__product_set: set[Product] = set(self.products)
         self.__str_to_product: dict[str,Product] = { p.name : p for p in self.products}
-        #self.quantity_total = sum(x.qty.value for x in product_quantities.values())
+        # Product whose BoM this is, which gets a new revision when the quantities are edited in place
+        self._owner: Product | None = None
+
+    @property
+    def product_quantities(self) -> dict[Product, "ProductInstance"]:
+        if self.__product_quantities is None:
+            unit = self.__vector.unit
+            self.__product_quantities = {
+                p: ProductInstance(p, Quantity(qty, unit))
+                for p, qty in zip(self.products, self.__vector.values.tolist())
+            }
+            # The instances can be modified from now on, so the vector may no longer match them
+            self.__vector = None
+        return self.__product_quantities
+
+    def to_vector(self) -> QuantityVector:
+        """Quantities in the order of products, which must all be in one unit."""
+        if self.__vector is not None:
+            return self.__vector
+        if not len(self.products):
+            raise ValueError("An empty BoM has no unit to form a vector")
+        return QuantityVector.from_quantities([p.qty for p in self.product_quantities.values()])
+
+    def quantity_values(self) -> np.ndarray:
+        """Values of the quantities in the order of products, each in the unit of its own instance."""
+        if self.__vector is not None:
+            return self.__vector.values
+        return np.fromiter(
+            (x.qty.value for x in self.__product_quantities.values()), dtype=np.float64, count=len(self.products)
+        )
+
     @property
     def quantity_total(self) -> float:
-        return sum(x.qty.value for x in self.product_quantities.values())
+        if self.__vector is not None:
+            return float(self.__vector.values.sum())
+        return sum(x.qty.value for x in self.__product_quantities.values())
 
     def set_quantity_of_product(self,product_name,qty):
         self.product_quantities[self.__str_to_product[product_name]].qty = Quantity(qty,self.__str_to_product[product_name].reference_quantity.unit)
+        if self._owner is not None:
+            self._owner._renew_bom_revision()
     def __str__(self) -> str:
         return "\n".join([f"{p.name}: {q}" for p, q in self.product_quantities.items()])
 
@@ -150,29 +404,57 @@ class BoM:
             raise TypeError(err_msg)
             return None
 
-        multiplied_quantities = {p: q * other for p, q in self.product_quantities.items()}
-        return BoM(multiplied_quantities)
+        factor = other.value if isinstance(other, Quantity) else other
+        if self.__vector is not None:
+            return BoM.from_vector(self.products, self.__vector * factor)
+        # Every instance keeps its own unit, as the quantities of a BoM may be in different units
+        return BoM(
+            {
+                p: ProductInstance(p_instance.product, Quantity(p_instance.qty.value * factor, p_instance.qty.unit))
+                for p, p_instance in self.__product_quantities.items()
+            }
+        )
 
     def __contains__(self, item):
         if isinstance(item, str):
-            return item in [p.name for p in self.products]
+            return item in self.__str_to_product
         elif isinstance(item, ProductInstance):
-            return item.product in self.products
+            return item.product in self.__product_set
         elif isinstance(item, Product):
-            return item in self.products
+            return item in self.__product_set
+        return False
 
 
 class ProductInstance:
     """An instance of a product with a specific quantity."""
 
+    __slots__ = ("product", "qty", "_bom", "_bom_qty", "_bom_revision")
+
     def __init__(self, product: Product, quantity: Quantity):
         self.product: Product = product
         self.qty: Quantity = quantity
-        self.bom: BoM = BoM(
-            {p: qty * self.qty for p, qty in self.product.bom.product_quantities.items()}) if self.product.bom else {}
+        # The scaled BoM is only built when accessed, arithmetic on instances never needs it
+        self._bom: BoM | dict | None = None
+        # Quantity and product BoM revision the scaled BoM was built from
+        self._bom_qty: Quantity | None = None
+        self._bom_revision: int | None = None
+
+    @property
+    def bom(self) -> "BoM | dict":
+        """Copy of the product BoM scaled by the quantity of this instance, built on first access.
+
+        It is built again when the quantity is replaced or the product BoM has changed since.
+        """
+        if self._bom is None or self._bom_qty is not self.qty or self._bom_revision != self.product._bom_revision:
+            self._bom = self.product.bom * self.qty if self.product.bom else {}
+            self._bom_qty = self.qty
+            self._bom_revision = self.product._bom_revision
+        return self._bom
 
     def get_final_bom(self) -> BoM:
-        return self.product.get_final_bom() * self.qty
+        from batterway.datamodel.generic.flattening import default_flattener
+
+        return default_flattener.final_bom(self.product, self.qty.value)
 
     def _compatibility_check(self, other: "ProductInstance | Quantity | float | int") -> bool:
         """Check if an object is compatible with the Quantity object."""
@@ -247,23 +529,44 @@ class ProductInstance:
         return f"{self.qty} of {self.product.name}"
 
 
+@lru_cache(maxsize=None)
+def parse_formula(formula: str) -> Substance:
+    """Parse a chemical formula once; the Substance is shared by every compound and inventory using that formula."""
+    return Substance.from_formula(formula)
+
+
+@lru_cache(maxsize=None)
+def element_masses(formula: str) -> tuple[tuple[str, float], ...]:
+    """Atomic mass contributed by each element of a chemical formula, as (symbol, mass) pairs."""
+    return tuple(
+        (symbols[ele - 1], relative_atomic_masses[ele - 1] * qty)
+        for ele, qty in parse_formula(formula).composition.items()
+        if ele > 0  # 0 holds the charge of ions
+    )
+
+
+@lru_cache(maxsize=None)
+def element_mass_fractions(formula: str) -> tuple[tuple[str, float], ...]:
+    """Relative mass of each element of a chemical formula, as (symbol, mass fraction) pairs."""
+    total_mass = sum(mass for _, mass in element_masses(formula))
+    return tuple((elem, mass / total_mass) for elem, mass in element_masses(formula))
+
+
 class ChemicalCompound(Product):
     """A chemical compound with a name, sentier.dev ProductIRI, and chemical formula."""
 
+    __slots__ = ("chemical_formula", "__chemical_formula", "molar_mass")
+
     def __init__(self, name: str, iri: URIRef, reference_quantity: Quantity, formula: str):
         super().__init__(name, iri, reference_quantity, bom=None)
-        self.__chemical_formula: Substance = Substance.from_formula(formula)
+        self.chemical_formula: str = formula
+        self.__chemical_formula: Substance = parse_formula(formula)
         self.molar_mass = self.__chemical_formula.mass
 
     def _get_mass_per_element(self) -> dict[str, float]:
         """Get the atomic mass of each element in the chemical formula."""
-        return {
-            symbols[ele - 1]: (relative_atomic_masses[ele - 1] * qty)
-            for ele, qty in self.__chemical_formula.composition.items()
-        }
+        return dict(element_masses(self.chemical_formula))
 
     def get_molar_share(self) -> dict[str, float]:
         """Get the relative mass of each element in the chemical formula."""
-        mass_per_element = self._get_mass_per_element()
-        total_mass = sum(mass_per_element.values())
-        return {elem: mass / total_mass for elem, mass in mass_per_element.items()}
+        return dict(element_mass_fractions(self.chemical_formula))
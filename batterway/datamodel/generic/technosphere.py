@@ -0,0 +1,101 @@
+"""Sparse matrix (Leontief) view of a product graph, for computing many final BoMs at once."""
+
+from collections.abc import Iterable, Mapping, Sequence
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve_triangular
+
+from batterway.datamodel.generic.flattening import topological_order
+from batterway.datamodel.generic.product import BoM, Product, ProductInstance, Quantity
+
+
+class Technosphere:
+    """Products indexing a sparse technosphere matrix.
+
+    Column j of the matrix holds the BoM of one reference quantity of product j, so the raw materials needed for a
+    demand vector d (in reference quantities) are the raw product rows of (I - A)^-1 d. Products are ordered so that
+    every product comes after its sub-products, which makes A strictly upper triangular.
+    """
+
+    def __init__(self, products: Iterable[Product]):
+        self.products: list[Product] = topological_order(products)
+        self.index: dict[Product, int] = {p: i for i, p in enumerate(self.products)}
+        self.__name_to_index: dict[str, int] = {p.name: i for i, p in enumerate(self.products)}
+        self.raw_products: list[Product] = [p for p in self.products if p.bom is None]
+        self.raw_index = np.array([self.index[p] for p in self.raw_products], dtype=np.int64)
+
+        rows, cols, values = [], [], []
+        for parent in self.products:
+            if parent.bom is None:
+                continue
+            for child, p_instance in parent.bom.product_quantities.items():
+                rows.append(self.index[child])
+                cols.append(self.index[parent])
+                values.append(p_instance.qty.value)
+        size = len(self.products)
+        self.matrix: sparse.csr_matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), (rows, cols)), shape=(size, size)
+        )
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def demand_matrix(self, demands: Sequence[Mapping[Product | str, float]]) -> sparse.csc_matrix:
+        """Build a (products x demands) matrix from one mapping of product (or product name) to quantity per demand."""
+        rows, cols, values = [], [], []
+        for col, demand in enumerate(demands):
+            for product, qty in demand.items():
+                rows.append(self.__name_to_index[product] if isinstance(product, str) else self.index[product])
+                cols.append(col)
+                values.append(qty)
+        return sparse.csc_matrix(
+            (np.asarray(values, dtype=np.float64), (rows, cols)), shape=(len(self.products), len(demands))
+        )
+
+    def total_requirements(self, demand: np.ndarray | sparse.spmatrix, method: str = "solve") -> np.ndarray:
+        """Total (intermediate and raw) requirements of each demand column, as a dense (products x demands) array.
+
+        method is either "solve", a single triangular sparse solve of (I - A) X = D, or "series", the power series
+        D + A D + A^2 D + ..., which terminates after as many terms as the BoM graph is deep.
+        """
+        demand = demand.toarray() if sparse.issparse(demand) else np.asarray(demand, dtype=np.float64)
+        if demand.ndim == 1:
+            demand = demand[:, None]
+        if method == "solve":
+            system = (sparse.identity(len(self.products), format="csr") - self.matrix).tocsr()
+            return spsolve_triangular(system, demand, lower=False, unit_diagonal=True)
+        if method == "series":
+            total = demand.copy()
+            term = demand
+            for _ in range(len(self.products)):
+                term = self.matrix @ term
+                if not term.any():
+                    break
+                total += term
+            return total
+        err_msg = f"Unknown method {method}, expected 'solve' or 'series'"
+        raise ValueError(err_msg)
+
+    def final_boms(self, demand: np.ndarray | sparse.spmatrix, method: str = "solve") -> np.ndarray:
+        """Raw material composition of each demand column, as a dense (raw products x demands) array."""
+        return self.total_requirements(demand, method)[self.raw_index]
+
+    def final_bom(self, item: Product | ProductInstance, method: str = "solve") -> BoM:
+        """Final BoM of a product (per reference quantity) or of a product instance, as computed by get_final_bom."""
+        product, factor = (item.product, item.qty.value) if isinstance(item, ProductInstance) else (item, 1.0)
+        demand = np.zeros(len(self.products))
+        demand[self.index[product]] = factor
+        if product.bom is None:
+            return BoM({product: ProductInstance(product, product.reference_quantity * factor)})
+        return self.to_bom(self.final_boms(demand, method)[:, 0])
+
+    def to_bom(self, raw_quantities: np.ndarray) -> BoM:
+        """BoM of the raw products with a strictly positive quantity in one column of final_boms."""
+        return BoM(
+            {
+                p: ProductInstance(p, Quantity(float(qty), p.reference_quantity.unit))
+                for p, qty in zip(self.raw_products, raw_quantities)
+                if qty > 0
+            }
+        )
@@ -0,0 +1,174 @@
+"""Registry of units by IRI with precomputed conversion factors between the units of a dimension."""
+
+import threading
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from batterway.datamodel.generic.product import Quantity, QuantityVector, Unit
+
+SIMAPRO_UNIT_IRI = "https://vocab.sentier.dev/simapro/unit/"
+
+# (dimension, factor to the first unit of the dimension) of the units known without any declaration
+DEFAULT_UNITS: dict[str, tuple[str, float]] = {
+    f"{SIMAPRO_UNIT_IRI}kg": ("mass", 1.0),
+    f"{SIMAPRO_UNIT_IRI}g": ("mass", 1e-3),
+    f"{SIMAPRO_UNIT_IRI}t": ("mass", 1e3),
+    f"{SIMAPRO_UNIT_IRI}kWh": ("energy", 1.0),
+    f"{SIMAPRO_UNIT_IRI}Wh": ("energy", 1e-3),
+    f"{SIMAPRO_UNIT_IRI}MJ": ("energy", 1 / 3.6),
+}
+
+
+class UnitRegistry:
+    """Units keyed by their UnitIRI, each with a dimension and a factor to a common unit of that dimension.
+
+    A dense (units x units) conversion table is precomputed per dimension on first use after a registration, so that
+    converting whole columns of quantities costs a few array lookups. Units without a registered IRI can only be
+    converted to themselves.
+    """
+
+    def __init__(self, units: dict[str, tuple[str, float]] | None = None):
+        # Unit IRIs of each dimension, in registration order, with their factors to the common unit
+        self.dimensions: dict[str, list[str]] = {}
+        self.__factors: dict[str, list[float]] = {}
+        self.__locations: dict[str, tuple[str, int]] = {}
+        self.__tables: dict[str, np.ndarray] = {}
+        self.__lock = threading.Lock()
+        for iri, (dimension, factor) in (units or {}).items():
+            self.register(iri, dimension, factor)
+
+    @classmethod
+    def from_declarations(cls, declarations: Iterable[tuple[str, str, float]]) -> "UnitRegistry":
+        """Registry of DEFAULT_UNITS and of the declared (iri, dimension, factor) units, on the declared bases.
+
+        When the declarations include a default unit, the defaults of its dimension are rescaled to its declared
+        factor, so that a dimension can take any of its units as base. Declarations that contradict each other, or
+        two default units declared with another ratio than theirs, raise ValueError.
+        """
+        declarations = [(str(iri), dimension, float(factor)) for iri, dimension, factor in declarations]
+        scales: dict[str, float] = {}
+        for iri, dimension, factor in declarations:
+            default = DEFAULT_UNITS.get(iri)
+            if default is not None and default[0] == dimension:
+                scales.setdefault(dimension, factor / default[1])
+        registry = cls(
+            {
+                iri: (dimension, factor * scales.get(dimension, 1.0))
+                for iri, (dimension, factor) in DEFAULT_UNITS.items()
+            }
+        )
+        for iri, dimension, factor in declarations:
+            registry.register(iri, dimension, factor)
+        return registry
+
+    def __getstate__(self) -> dict:
+        # The lock cannot be pickled and the tables are rebuilt on first use
+        state = self.__dict__.copy()
+        del state["_UnitRegistry__lock"]
+        state["_UnitRegistry__tables"] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def register(self, iri: str, dimension: str, factor: float) -> None:
+        """Declare that one unit of IRI iri is factor common units of dimension.
+
+        Registering a known IRI again is allowed only with the same dimension and factor.
+        """
+        iri = str(iri)
+        if not factor > 0:
+            err_msg = f"The factor of unit {iri} must be positive, got {factor}"
+            raise ValueError(err_msg)
+        with self.__lock:
+            location = self.__locations.get(iri)
+            if location is not None:
+                known_dimension, position = location
+                if known_dimension != dimension or not np.isclose(self.__factors[dimension][position], factor):
+                    known_factor = self.__factors[known_dimension][position]
+                    err_msg = (
+                        f"Unit {iri} is already registered as {known_factor} {known_dimension}, "
+                        f"not {factor} {dimension}"
+                    )
+                    raise ValueError(err_msg)
+                return
+            self.__locations[iri] = (dimension, len(self.dimensions.setdefault(dimension, [])))
+            self.dimensions[dimension].append(iri)
+            self.__factors.setdefault(dimension, []).append(float(factor))
+            self.__tables.pop(dimension, None)
+
+    def __contains__(self, unit: Unit | str) -> bool:
+        return self.__key(unit) in self.__locations
+
+    @staticmethod
+    def __key(unit: Unit | str) -> str | None:
+        if isinstance(unit, Unit):
+            return None if unit.iri is None else str(unit.iri)
+        return str(unit)
+
+    def dimension(self, unit: Unit | str) -> str | None:
+        location = self.__locations.get(self.__key(unit))
+        return None if location is None else location[0]
+
+    def table(self, dimension: str) -> np.ndarray:
+        """(units x units) factors of the dimension: table[i, j] converts unit i into unit j."""
+        table = self.__tables.get(dimension)
+        if table is None:
+            factors = np.array(self.__factors[dimension])
+            table = factors[:, None] / factors[None, :]
+            self.__tables[dimension] = table
+        return table
+
+    def factor(self, from_unit: Unit, to_unit: Unit) -> float:
+        """Factor converting quantities in from_unit into to_unit."""
+        return float(self.factors([from_unit], [to_unit])[0])
+
+    def factors(self, from_units: Sequence[Unit], to_units: Sequence[Unit]) -> np.ndarray:
+        """Factors converting quantities in each of from_units into the unit at the same position in to_units.
+
+        The units are looked up once per distinct unit, the factors of all the pairs are then gathered from the
+        conversion tables at once. Raises ValueError when a pair cannot be converted.
+        """
+        codes: dict[Unit, int] = {}
+        from_codes = np.fromiter((codes.setdefault(u, len(codes)) for u in from_units), np.int64, len(from_units))
+        to_codes = np.fromiter((codes.setdefault(u, len(codes)) for u in to_units), np.int64, len(to_units))
+        units = list(codes)
+        keys = [self.__key(u) for u in units]
+        # Conversion factors between the distinct units, NaN between units of different or unknown dimensions
+        distinct = np.full((len(units), len(units)), np.nan)
+        np.fill_diagonal(distinct, 1.0)
+        by_dimension: dict[str, list[tuple[int, int]]] = {}
+        unregistered: dict[str, list[int]] = {}
+        for i, key in enumerate(keys):
+            location = self.__locations.get(key)
+            if location is not None:
+                by_dimension.setdefault(location[0], []).append((i, location[1]))
+            elif key is not None:
+                unregistered.setdefault(key, []).append(i)
+        for dimension, members in by_dimension.items():
+            rows, positions = (np.array(column) for column in zip(*members))
+            distinct[np.ix_(rows, rows)] = self.table(dimension)[np.ix_(positions, positions)]
+        # Unregistered units with the same IRI are the same unit
+        for rows in unregistered.values():
+            distinct[np.ix_(rows, rows)] = 1.0
+        result = distinct[from_codes, to_codes]
+        invalid = np.flatnonzero(np.isnan(result))
+        if len(invalid):
+            pairs = sorted({(from_units[i].name, to_units[i].name) for i in invalid})
+            err_msg = f"Cannot convert between units {pairs}: different or unregistered dimensions"
+            raise ValueError(err_msg)
+        return result
+
+    def convert(self, quantity: Quantity | QuantityVector, unit: Unit) -> Quantity | QuantityVector:
+        """Quantity or quantity vector expressed in unit."""
+        if quantity.unit is unit:
+            return quantity
+        if isinstance(quantity, QuantityVector):
+            return QuantityVector(quantity.values * self.factor(quantity.unit, unit), unit)
+        return Quantity(quantity.value * self.factor(quantity.unit, unit), unit)
+
+
+# Conversions between the default units, for quantities that do not come from an inventory
+default_registry = UnitRegistry(DEFAULT_UNITS)
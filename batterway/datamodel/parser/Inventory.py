@@ -1,196 +1,522 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
 from pathlib import Path
+from typing import Literal
 
+import numpy as np
 import pandas as pd
+from pydantic import AnyUrl
 
+from batterway import __version__
+from batterway.datamodel.generic.chemistry import ElementMassFractions
 from batterway.datamodel.generic.process import RecyclingProcess
-from batterway.datamodel.generic.product import BoM, ChemicalCompound, Product, ProductInstance, Unit, Quantity
-from batterway.datamodel.parser.parsers import (
-    BoMPdt,
-    ChemicalCompoundPdt,
-    ProcessLCIPdt,
-    ProductPdt,
-    QuantityPdt,
-    UnitPdt, RecyclingProcessPdt, FixedLCIPdt,
+from batterway.datamodel.generic.product import (
+    BoM,
+    ChemicalCompound,
+    Product,
+    ProductInstance,
+    Quantity,
+    Unit,
+    parse_formula,
 )
+from batterway.datamodel.generic.technosphere import Technosphere
+from batterway.datamodel.generic.units import UnitRegistry, default_registry
+from batterway.datamodel.parser.parsers import ProcessLCIPdt, validate_columns
+
+
+# Serializes the materialization of lazy inventories, so that threads sharing one never build a product twice
+_materialize_lock = threading.RLock()
+
+
+class InventoryTables:
+    """Validated content of the inventory CSV files, indexed by name, from which the real objects are built.
+
+    Building is incremental: products are created together with the products of their BoM, and processes together
+    with the products they use, so that an inventory can materialize only what a job needs.
+    """
+
+    def __init__(self, file_name: Path, load_relative_lcis: bool = True):
+        # Every table is validated column by column, then indexed from the validated column lists
+        self.units: dict[str, Unit]
+        self.unit_registry: UnitRegistry
+        self.units, self.unit_registry = self.read_units(file_name)
+
+        # Merge chemical and product as they should be unique by Id
+        self.products: dict[str, tuple[str | None, float, Unit, str]] = {}
+        self.chemical_formulas: dict[str, str] = {}
+        product_schema = {
+            "name": str, "iri": AnyUrl | None, "reference_quantity": float | int, "unit": str, "BoM_id": str
+        }
+        for table, schema in (
+            ("products.csv", product_schema),
+            ("chemical_compounds.csv", product_schema | {"chemical_formula": str}),
+        ):
+            product_columns = validate_columns(
+                read_csv(file_name.joinpath(table)).fillna({"iri": "https://empty.com", "BoM_id": ""}),
+                table,
+                schema,
+            )
+            for name, iri, qty, unit, bom_id in zip(
+                product_columns["name"],
+                product_columns["iri"],
+                product_columns["reference_quantity"],
+                lookup(self.units, product_columns["unit"], table, "unit"),
+                product_columns["BoM_id"],
+            ):
+                self.products[name] = (None if iri is None else str(iri), qty, unit, bom_id.strip())
+            for name, formula in zip(product_columns["name"], product_columns.get("chemical_formula", ())):
+                try:
+                    parse_formula(formula)
+                except Exception as e:
+                    err_msg = f"Invalid chemical_formula {formula!r} of {name} in {table}"
+                    raise ValueError(err_msg) from e
+                self.chemical_formulas[name] = formula
+
+        bom_columns = validate_columns(
+            read_csv(file_name.joinpath("BoM.csv")),
+            "BoM.csv",
+            {"BoMId": str, "Material": str, "Quantity": float | int, "Unit": str},
+        )
+        lookup(self.products, bom_columns["Material"], "BoM.csv", "Material")
+        # Quantities are converted to the reference unit of their material in one pass, so that every BoM of the
+        # inventory is in reference units and arithmetic never has to convert
+        reference_units = [self.products[material][2] for material in bom_columns["Material"]]
+        bom_units = lookup(self.units, bom_columns["Unit"], "BoM.csv", "Unit")
+        try:
+            factors = self.unit_registry.factors(bom_units, reference_units)
+        except ValueError as e:
+            err_msg = f"Invalid BoM.csv units: {e}"
+            raise ValueError(err_msg) from e
+        quantities = np.asarray(bom_columns["Quantity"], dtype=np.float64) * factors
+        self.boms: dict[str, list[tuple[str, float, Unit]]] = {}
+        for bom_id, material, qty, unit in zip(
+            bom_columns["BoMId"], bom_columns["Material"], quantities.tolist(), reference_units
+        ):
+            self.boms.setdefault(bom_id, []).append((material, qty, unit))
+
+        # Left empty when the relative LCIs are streamed with iter_relative_lcis instead. Lazy inventories fill
+        # relative_lci_blocks, from which read_relative_lci reads the relative LCI of a process on first request
+        self.relative_lci_file = file_name.joinpath("lci_relative.csv")
+        self.relative_lci_blocks: dict[str, tuple[int, int]] = {}
+        self.relative_lcis: dict[str, ProcessLCIPdt] = (
+            {
+                lci_id: ProcessLCIPdt.model_construct(
+                    lci_id=lci_id, relative_lci_input=relations["input"], relative_lci_output=relations["output"]
+                )
+                for lci_id, relations in group_relative_lci(read_csv(file_name.joinpath("lci_relative.csv"))).items()
+            }
+            if load_relative_lcis
+            else {}
+        )
+
+        fixed_lci_columns = validate_columns(
+            read_csv(file_name.joinpath("fixedlci.csv")),
+            "fixedlci.csv",
+            {"lci_id": str, "product": str, "ref_in_rel_lci": str},
+        )
+        lookup(self.products, fixed_lci_columns["product"], "fixedlci.csv", "product")
+        self.fixed_lcis: dict[str, dict[str, dict[str, None]]] = {}
+        for lci_id, product, ref_label in zip(
+            fixed_lci_columns["lci_id"], fixed_lci_columns["product"], fixed_lci_columns["ref_in_rel_lci"]
+        ):
+            self.fixed_lcis.setdefault(lci_id, {}).setdefault(ref_label, {})[product] = None
+
+        process_columns = validate_columns(
+            read_csv(file_name.joinpath("recycling_process.csv")),
+            "recycling_process.csv",
+            {"process_name": str, "fixed_input_bom_id": str, "relative_lci_id": str},
+        )
+        self.processes: dict[str, tuple[str, str]] = {
+            process_name: (fixed_input_bom_id, relative_lci_id)
+            for process_name, fixed_input_bom_id, relative_lci_id in zip(
+                process_columns["process_name"],
+                process_columns["fixed_input_bom_id"],
+                process_columns["relative_lci_id"],
+            )
+        }
+
+    @staticmethod
+    def read_units(file_name: Path) -> tuple[dict[str, Unit], UnitRegistry]:
+        """Interned units of units.csv by name, and the registry of the default units and of those it declares.
+
+        The optional dimension and factor columns declare a unit as factor times the base unit of its dimension, see
+        UnitRegistry.from_declarations. The registry belongs to the inventory, so that loading one never changes the
+        conversions of another.
+        """
+        units_table = read_csv(file_name.joinpath("units.csv"))
+        units_columns = validate_columns(units_table, "units.csv", {"name": str, "iri": AnyUrl | None})
+        units = {
+            name: Unit.intern(name, None if iri is None else str(iri))
+            for name, iri in zip(units_columns["name"], units_columns["iri"])
+        }
+        declarations = []
+        if "dimension" in units_table.columns:
+            conversion_columns = validate_columns(
+                units_table.dropna(subset=["dimension"]), "units.csv", {"name": str, "dimension": str, "factor": float}
+            )
+            for name, dimension, factor in zip(*conversion_columns.values()):
+                if units[name].iri is None:
+                    err_msg = f"Unit {name} of units.csv needs an IRI to declare a conversion"
+                    raise ValueError(err_msg)
+                declarations.append((units[name].iri, dimension, factor))
+        return units, UnitRegistry.from_declarations(declarations)
+
+    def materialize_products(self, names: Iterable[str], products: dict[str, Product]) -> None:
+        """Create the named products and every product reachable through their BoMs, adding them to products.
+
+        The new products are only added once their BoMs are set, so that readers of products never see them half-built.
+        """
+        new_names = list(dict.fromkeys(name for name in names if name not in products))
+        seen = set(new_names)
+        position = 0
+        while position < len(new_names):
+            bom_id = self.products[new_names[position]][3]
+            if len(bom_id):
+                for material, _, _ in self.boms[bom_id]:
+                    if material not in products and material not in seen:
+                        seen.add(material)
+                        new_names.append(material)
+            position += 1
+
+        # Now we have to create the real object
+        # And associate the BoM to their respective product
+        new_products: dict[str, Product] = {}
+        for name in new_names:
+            iri, qty, unit, _ = self.products[name]
+            if name in self.chemical_formulas:
+                new_products[name] = ChemicalCompound(name, iri, Quantity(qty, unit), self.chemical_formulas[name])
+            else:
+                new_products[name] = Product(name, iri, Quantity(qty, unit), bom=None)
+        for name in new_names:
+            bom_id = self.products[name][3]
+            if len(bom_id):
+                materials = [new_products.get(material) or products[material] for material, _, _ in self.boms[bom_id]]
+                new_products[name].bom = BoM(
+                    {
+                        material: ProductInstance(material, Quantity(qty, unit))
+                        for material, (_, qty, unit) in zip(materials, self.boms[bom_id])
+                    }
+                )
+        products.update(new_products)
+
+    def read_relative_lci(self, relative_lci_id: str) -> ProcessLCIPdt:
+        """Read the rows of relative_lci_id at their position in relative_lci_blocks, keeping them for later calls."""
+        if relative_lci_id not in self.relative_lci_blocks:
+            err_msg = f"No relative LCI {relative_lci_id} found in {self.relative_lci_file.name}"
+            raise ValueError(err_msg)
+        offset, n_rows = self.relative_lci_blocks[relative_lci_id]
+        columns = pd.read_csv(self.relative_lci_file, sep=";", nrows=0).columns
+        with self.relative_lci_file.open("rb") as f:
+            f.seek(offset)
+            df_block = pd.read_csv(f, sep=";", decimal=".", names=columns, header=None, nrows=n_rows)
+        relations = next(iter(group_relative_lci(df_block).values()))
+        relative_lci = ProcessLCIPdt.model_construct(
+            lci_id=relative_lci_id, relative_lci_input=relations["input"], relative_lci_output=relations["output"]
+        )
+        self.relative_lcis[relative_lci_id] = relative_lci
+        return relative_lci
+
+    def build_process(
+        self, process_name: str, products: dict[str, Product], relative_lci: ProcessLCIPdt | None = None
+    ) -> RecyclingProcess:
+        """Create a recycling process, materializing the products it uses into products.
+
+        relative_lci defaults to the indexed relative LCI of the process, which is streamed from lci_relative.csv
+        when the relative LCIs were not loaded.
+        """
+        fixed_input_bom_id, relative_lci_id = self.processes[process_name]
+        fixed_lci = self.fixed_lcis[fixed_input_bom_id]
+        if relative_lci is None:
+            relative_lci = self.relative_lcis.get(relative_lci_id) or self.read_relative_lci(relative_lci_id)
+        self.materialize_products(
+            [name for names in fixed_lci.values() for name in names]
+            + [p[1] for p in relative_lci.relative_lci_input + relative_lci.relative_lci_output],
+            products,
+        )
+
+        fixed_lci_associated = {ref_label: [products[name] for name in names] for ref_label, names in fixed_lci.items()}
+        relative_lci_input = {
+            (p2, products[p[1]]): p[2] for p in relative_lci.relative_lci_input for p2 in fixed_lci_associated[p[0]]
+        }
+        relative_lci_output = {
+            (p2, products[p[1]]): p[2] for p in relative_lci.relative_lci_output for p2 in fixed_lci_associated[p[0]]
+        }
+        return RecyclingProcess(
+            process_name,
+            inputs_products=BoM(
+                {
+                    p: ProductInstance(p, p.reference_quantity)
+                    for fixed_products in fixed_lci_associated.values()
+                    for p in fixed_products
+                }
+            ),
+            output_products=BoM({}),
+            ref_input_to_input=relative_lci_input,
+            ref_input_to_output=relative_lci_output,
+        )
 
 
 class Inventory:
+    # Files read by create_from_file
+    SOURCE_FILES = (
+        "units.csv",
+        "products.csv",
+        "chemical_compounds.csv",
+        "BoM.csv",
+        "lci_relative.csv",
+        "fixedlci.csv",
+        "recycling_process.csv",
+    )
+    # Bump when the pickled layout of the inventory objects changes, to discard older snapshots
+    SNAPSHOT_FORMAT = 7
+
     def __init__(
             self,
             units: dict[str, Unit] | None,
             products: list[str:Product] | None,
             process_lcis: dict[str, RecyclingProcess] | None,
+            tables: InventoryTables | None = None,
+            unit_registry: UnitRegistry | None = None,
     ):
         self.units = units
+        # Conversions between the units of this inventory, as declared by its units.csv
+        self.unit_registry: UnitRegistry = default_registry if unit_registry is None else unit_registry
         self.products = products
         self.process_lcis: dict[str, RecyclingProcess] = process_lcis
+        # Only set for lazy inventories, which build products and processes on first request
+        self.tables: InventoryTables | None = tables
+        self.__technosphere: Technosphere | None = None
+        # Latest BoM revision of the products of the view, and value of Product._last_bom_revision when it was checked
+        self.__technosphere_revision: int | None = None
+        self.__technosphere_checked: int | None = None
+        self.__mass_fractions: ElementMassFractions | None = None
 
     def get_process(self,process_name:str)->RecyclingProcess:
+        if process_name not in self.process_lcis and self.tables is not None:
+            with _materialize_lock:
+                if process_name not in self.process_lcis:
+                    self.process_lcis[process_name] = self.tables.build_process(process_name, self.products)
         return self.process_lcis[process_name]
-    @classmethod
-    def create_from_file(cls, file_name: Path):
-        pydt_units_obj = [
-            UnitPdt(**x[1].to_dict()) for x in Inventory.__read_csv(file_name.joinpath("units.csv")).iterrows()
-        ]
-        all_unit = {u.name: u for u in pydt_units_obj}
-        # Parse product
-        pydt_products_parsed = [
-            ProductPdt(
-                **x[1].to_dict()
-                  | {
-                      "reference_quantity": QuantityPdt(
-                          quantity=x[1].to_dict()["reference_quantity"], unit=all_unit[x[1].to_dict()["unit"]]
-                      )
-                  }
-            )
-            for x in Inventory.__read_csv(file_name.joinpath("products.csv"))
-            .fillna({"iri": "https://empty.com", "BoM_id": ""})
-            .iterrows()
-        ]
-        # Parse chemical
-        pydt_chemical_compounds = [
-            ChemicalCompoundPdt(
-                **x[1].to_dict()
-                  | {
-                      "reference_quantity": QuantityPdt(
-                          quantity=x[1].to_dict()["reference_quantity"], unit=all_unit[x[1].to_dict()["unit"]]
-                      )
-                  }
-            )
-            for x in Inventory.__read_csv(file_name.joinpath("chemical_compounds.csv"))
-            .fillna({"iri": "https://empty.com", "BoM_id": ""})
-            .iterrows()
-        ]
 
-        # Merge chemical and product as they should be unique by Id
-        all_products = {p.name: p for p in pydt_products_parsed + pydt_chemical_compounds}
-        all_boms = dict()
-        for BoMId, df_bom_product in Inventory.__read_csv(file_name.joinpath("BoM.csv")).groupby("BoMId"):
-            all_boms[BoMId] = BoMPdt(
-                BoMId=BoMId,
-                product_quantities={
-                    all_products[row["Material"]].name: QuantityPdt(
-                        quantity=row["Quantity"], unit=all_unit[row["Unit"]]
-                    )
-                    for _, row in df_bom_product.iterrows()
-                },
-            )
+    def get_product(self, product_name: str) -> Product:
+        if product_name not in self.products and self.tables is not None:
+            with _materialize_lock:
+                if product_name not in self.products:
+                    self.tables.materialize_products([product_name], self.products)
+        return self.products[product_name]
 
-        all_process_lcis = dict()
+    def get_technosphere(self) -> Technosphere:
+        """Sparse matrix view of all the products of the inventory, rebuilt when a product BoM has changed.
 
-        for lci_id, df_lci_product in Inventory.__read_csv(file_name.joinpath("lci_relative.csv")).groupby(
-            "lci_id"
-        ):
-            grouped_by_direction = df_lci_product.groupby(["direction"])
-            relative_lc_input = [(row["influencer"], row["influenced"], row["qty"])
-                                 for _, row in grouped_by_direction.get_group(("input",)).iterrows()]
-            relative_lc_output = [(row["influencer"], row["influenced"], row["qty"])
-                                  for _, row in grouped_by_direction.get_group(("output",)).iterrows()]
-            all_process_lcis[lci_id] = ProcessLCIPdt(
-                lci_id=lci_id,
-                relative_lci_input=relative_lc_input,
-                relative_lci_output=relative_lc_output,
-            )
-        pydt_fixed_lci = [
-            FixedLCIPdt(
-                **{
-                    "lci_id":lci_id,
-                    "ref_to_product_list": {rel_product:list(df_rel_target_product['product'].unique())
-                for rel_product, df_rel_target_product in df_lci.groupby('ref_in_rel_lci')},
-                }
+        For a lazy inventory, only the products materialized so far are part of the view.
+        """
+        # Products may be materialized meanwhile by other threads
+        with _materialize_lock:
+            last_revision = Product._last_bom_revision
+            if self.__technosphere_checked != last_revision:
+                # Some BoM changed since the last call, the view is only rebuilt if it is a BoM of this inventory
+                revision = max((p._bom_revision for p in self.products.values()), default=0)
+                if revision != self.__technosphere_revision:
+                    self.__technosphere = None
+                    self.__technosphere_revision = revision
+                self.__technosphere_checked = last_revision
+            if self.__technosphere is None or len(self.__technosphere) != len(self.products):
+                self.__technosphere = Technosphere(self.products.values())
+            return self.__technosphere
 
-            ) for lci_id,df_lci in Inventory.__read_csv(file_name.joinpath("fixedlci.csv")).groupby("lci_id")
-        ]
-        pydt_recycling_process = [
-            RecyclingProcessPdt(
-                **x[1].to_dict()
-                  | {
-                      "relative_lci": all_process_lcis[x[1]["relative_lci_id"]]
-                  }
-            )
-            for x in Inventory.__read_csv(file_name.joinpath("recycling_process.csv"))
-            .iterrows()
-        ]
-        # Now we have to create the real object
-        # And associate the BoM to their respective product
-        real_units = {
-            u.name: u for u in (Unit(x[1].name, None if x[1].iri is None else str(x[1].iri)) for x in all_unit.items())
-        }
-        real_products = (
-            Product(
-                x[1].name,
-                None if x[1].iri is None else str(x[1].iri),
-                x[1].reference_quantity.to_quantity(real_units),
-                bom=None,
-            )
-            if isinstance(x[1], ProductPdt)
-            else ChemicalCompound(
-                x[1].name,
-                None if x[1].iri is None else str(x[1].iri),
-                x[1].reference_quantity.to_quantity(real_units),
-                bom=None,
-            )
-            for x in all_products.items()
-        )
-        real_product_dict = {p.name: p for p in real_products}
+    def get_mass_fractions(self) -> ElementMassFractions:
+        """Compound x element mass fraction matrix of the chemical compounds of the inventory.
 
-        real_BoMs = {
-            v[1].BoMId: BoM(
-                {
-                    real_product_dict[p]: ProductInstance(real_product_dict[p], p_qty.to_quantity(real_units))
-                    for p, p_qty in v[1].product_quantities.items()
-                }
-            )
-            for v in all_boms.items()
-        }
+        For a lazy inventory, only the compounds materialized so far are part of the matrix.
+        """
+        with _materialize_lock:
+            compounds_count = sum(isinstance(p, ChemicalCompound) for p in self.products.values())
+            if self.__mass_fractions is None or len(self.__mass_fractions) != compounds_count:
+                self.__mass_fractions = ElementMassFractions(self.products.values())
+            return self.__mass_fractions
 
-        for p in all_products:
-            stripped_bom_id = all_products[p].BoM_id.strip()
-            if len(stripped_bom_id):
-                real_product_dict[p].bom = real_BoMs[stripped_bom_id]
+    @classmethod
+    def open_lazy(cls, file_name: Path) -> "Inventory":
+        """Index the CSV files of a folder without building any product or process.
 
-        real_fixed_lci = {
-            f_lci.lci_id:{ref_label:BoM(
-                {
-                    real_product_dict[p]: ProductInstance(
-                        real_product_dict[p],
-                        Quantity(1.0,real_product_dict[p].reference_quantity.unit )
-                    )
-                    for p in list_of_p
-                }
-            ) for ref_label, list_of_p in f_lci.ref_to_product_list.items()}
-            for f_lci in pydt_fixed_lci
-        }
-        real_recycling_process = dict()
-        for r_process in pydt_recycling_process:
+        Every table but lci_relative.csv is parsed and validated here, lci_relative.csv is only indexed by the byte
+        offset of the rows of each lci_id (see index_relative_lcis). get_process and get_product then build the
+        requested objects, and only the products they need, on first access. The relative LCI of a process is read
+        at its offset when the process is first requested, so that only the relations of the requested processes
+        are parsed and kept in memory.
+        """
+        tables = InventoryTables(file_name, load_relative_lcis=False)
+        tables.relative_lci_blocks = index_relative_lcis(tables.relative_lci_file)
+        return cls(tables.units, {}, {}, tables=tables, unit_registry=tables.unit_registry)
 
-            fixed_lci_associated = real_fixed_lci[r_process.fixed_input_bom_id]
-            relative_lci_input = {
-                (real_product_dict[p2.name], real_product_dict[p[1]]): p[2] for p in
-                      r_process.relative_lci.relative_lci_input for p2 in fixed_lci_associated[p[0]].products
-            }
-            relative_lci_output = {
-                (real_product_dict[p2.name], real_product_dict[p[1]]): p[2] for p in
-                r_process.relative_lci.relative_lci_output for p2 in fixed_lci_associated[p[0]].products
+    @classmethod
+    def create_from_file(cls, file_name: Path, cache_dir: Path | None = None, chunksize: int | None = None):
+        """Build the inventory from the CSV files of a folder.
+
+        When cache_dir is given, the built inventory is also stored there as a pickle snapshot keyed on the content
+        and modification time of the source files, and later calls with unchanged files load that snapshot instead of
+        parsing and validating the CSV files again.
+
+        When chunksize is given, lci_relative.csv is streamed chunksize rows at a time and each process is built as
+        soon as its relative LCI has been read, so that the whole table is never held in memory. The file must then
+        be grouped by lci_id.
+        """
+        if cache_dir is None:
+            return cls.__parse_files(file_name, chunksize)
+        snapshot = Path(cache_dir).joinpath(f"inventory-{Inventory.__snapshot_key(file_name)}.pkl")
+        if snapshot.exists():
+            with snapshot.open("rb") as f:
+                return pickle.load(f)
+        inventory = cls.__parse_files(file_name, chunksize)
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        # Write next to the final file and rename, so that concurrent workers never read a partial snapshot
+        f = tempfile.NamedTemporaryFile(dir=snapshot.parent, suffix=".tmp", delete=False)
+        try:
+            with f:
+                pickle.dump(inventory, f, protocol=5)
+            os.replace(f.name, snapshot)
+        except BaseException:
+            # Never leave a partial snapshot behind in the cache directory
+            os.unlink(f.name)
+            raise
+        return inventory
+
+    @staticmethod
+    def __snapshot_key(file_name: Path) -> str:
+        digest = hashlib.sha256(f"{__version__};{Inventory.SNAPSHOT_FORMAT}".encode())
+        for source in Inventory.SOURCE_FILES:
+            path = file_name.joinpath(source)
+            digest.update(f"{source};{path.stat().st_mtime_ns};".encode())
+            digest.update(path.read_bytes())
+        return digest.hexdigest()[:32]
+
+    @classmethod
+    def __parse_files(cls, file_name: Path, chunksize: int | None = None):
+        tables = InventoryTables(file_name, load_relative_lcis=chunksize is None)
+        real_product_dict: dict[str, Product] = {}
+        tables.materialize_products(tables.products, real_product_dict)
+        if chunksize is None:
+            real_recycling_process = {
+                process_name: tables.build_process(process_name, real_product_dict)
+                for process_name in tables.processes
             }
-            real_recycling_process[r_process.process_name] = RecyclingProcess(
-                r_process.process_name,
-                inputs_products=BoM({
-                    real_product_dict[p.name]: ProductInstance(real_product_dict[p.name],
-                                                               real_product_dict[p.name].reference_quantity)
-                    for bom in fixed_lci_associated.values() for p in bom.products
-                }),
-                output_products=BoM({}),
-                ref_input_to_input=relative_lci_input,
-                ref_input_to_output=relative_lci_output
-            )
+            return cls(tables.units, real_product_dict, real_recycling_process, unit_registry=tables.unit_registry)
 
-        return cls(real_units, real_product_dict, real_recycling_process)
+        processes_by_lci: dict[str, list[str]] = {}
+        for process_name, (_, relative_lci_id) in tables.processes.items():
+            processes_by_lci.setdefault(relative_lci_id, []).append(process_name)
+        built_processes = {}
+        for relative_lci in iter_relative_lcis(file_name.joinpath("lci_relative.csv"), chunksize):
+            for process_name in processes_by_lci.get(relative_lci.lci_id, []):
+                built_processes[process_name] = tables.build_process(process_name, real_product_dict, relative_lci)
+        missing = [p for p in tables.processes if p not in built_processes]
+        if missing:
+            err_msg = f"No relative LCI found in lci_relative.csv for processes {missing}"
+            raise ValueError(err_msg)
+        real_recycling_process = {process_name: built_processes[process_name] for process_name in tables.processes}
+        return cls(tables.units, real_product_dict, real_recycling_process, unit_registry=tables.unit_registry)
 
     @staticmethod
     def parse_possible_input(folder_path: Path):
-        df_fixed_lci = Inventory.__read_csv(folder_path.joinpath("fixed_lci.csv"))
+        df_fixed_lci = read_csv(folder_path.joinpath("fixed_lci.csv"))
 
-    @staticmethod
-    def __read_csv(file_name: Path):
-        return pd.read_csv(file_name, sep=";", decimal=".")
+
+RELATIVE_LCI_SCHEMA = {
+    "lci_id": str,
+    "direction": Literal["input", "output"],
+    "influencer": str,
+    "influenced": str,
+    "qty": float,
+}
+
+
+def group_relative_lci(df_lci: pd.DataFrame) -> dict[str, dict[str, list[tuple[str, str, float]]]]:
+    """Relations of each lci_id, split by direction and kept in file order."""
+    lci_columns = validate_columns(df_lci, "lci_relative.csv", RELATIVE_LCI_SCHEMA)
+    grouped: dict[str, dict[str, list[tuple[str, str, float]]]] = {}
+    for lci_id, direction, influencer, influenced, qty in zip(
+        lci_columns["lci_id"],
+        lci_columns["direction"],
+        lci_columns["influencer"],
+        lci_columns["influenced"],
+        lci_columns["qty"],
+    ):
+        grouped.setdefault(lci_id, {"input": [], "output": []})[direction].append((influencer, influenced, qty))
+    return grouped
+
+
+def iter_relative_lcis(file_name: Path, chunksize: int = 100_000) -> Iterator[ProcessLCIPdt]:
+    """Stream a relative LCI table chunk by chunk, yielding one ProcessLCIPdt per lci_id.
+
+    Only one chunk and the relations of the current lci_id are held in memory. The rows of an lci_id must therefore
+    be contiguous, which is checked row by row, whatever the chunk boundaries.
+    """
+    current_id: str | None = None
+    current: dict[str, list[tuple[str, str, float]]] = {"input": [], "output": []}
+    finished: set[str] = set()
+    for df_chunk in pd.read_csv(file_name, sep=";", decimal=".", chunksize=chunksize):
+        lci_columns = validate_columns(df_chunk, "lci_relative.csv", RELATIVE_LCI_SCHEMA)
+        for lci_id, direction, influencer, influenced, qty in zip(
+            lci_columns["lci_id"],
+            lci_columns["direction"],
+            lci_columns["influencer"],
+            lci_columns["influenced"],
+            lci_columns["qty"],
+        ):
+            if lci_id != current_id:
+                if lci_id in finished:
+                    err_msg = f"Rows of {lci_id} are not contiguous in {file_name.name}, sort it by lci_id"
+                    raise ValueError(err_msg)
+                if current_id is not None:
+                    finished.add(current_id)
+                    yield ProcessLCIPdt.model_construct(
+                        lci_id=current_id, relative_lci_input=current["input"], relative_lci_output=current["output"]
+                    )
+                current_id, current = lci_id, {"input": [], "output": []}
+            current[direction].append((influencer, influenced, qty))
+    if current_id is not None:
+        yield ProcessLCIPdt.model_construct(
+            lci_id=current_id, relative_lci_input=current["input"], relative_lci_output=current["output"]
+        )
+
+
+def index_relative_lcis(file_name: Path) -> dict[str, tuple[int, int]]:
+    """Byte offset of the first row and number of rows of each lci_id of a relative LCI table.
+
+    Only the lci_id field of each line is read, the rows themselves are parsed and validated when they are read. As
+    with iter_relative_lcis, the rows of an lci_id must be contiguous, which is checked.
+    """
+    blocks: dict[str, tuple[int, int]] = {}
+    current_id: str | None = None
+    with file_name.open("rb") as f:
+        offset = len(f.readline())
+        for line in f:
+            if line.strip():
+                lci_id = line.split(b";", 1)[0].decode().strip().strip('"')
+                if lci_id != current_id:
+                    if lci_id in blocks:
+                        err_msg = f"Rows of {lci_id} are not contiguous in {file_name.name}, sort it by lci_id"
+                        raise ValueError(err_msg)
+                    current_id = lci_id
+                    blocks[lci_id] = (offset, 0)
+                blocks[lci_id] = (blocks[lci_id][0], blocks[lci_id][1] + 1)
+            offset += len(line)
+    return blocks
+
+
+def lookup(objects: dict[str, object], names: list[str], table: str, column: str) -> list:
+    """Resolve a column of names, reporting every unknown name at once."""
+    try:
+        return [objects[name] for name in names]
+    except KeyError:
+        unknown = sorted(set(names) - objects.keys())
+        err_msg = f"Unknown {column} in {table}: {unknown}"
+        raise ValueError(err_msg) from None
+
+
+def read_csv(file_name: Path) -> pd.DataFrame:
+    return pd.read_csv(file_name, sep=";", decimal=".")
@@ -1,71 +1,31 @@
-from pydantic import AnyUrl, BaseModel
+from functools import lru_cache
 
-from batterway.datamodel.generic.product import Quantity, Unit
+import pandas as pd
+from pydantic import BaseModel, TypeAdapter
 
 
-### Battery parsers ###
-class UnitPdt(BaseModel):
-    """Pydantic parser model for the Unit class."""
+### Columnar validation ###
+@lru_cache
+def _column_adapter(column_type: object) -> TypeAdapter:
+    return TypeAdapter(list[column_type])
 
-    name: str
-    iri: AnyUrl | None
 
-
-class QuantityPdt(BaseModel):
-    """Pydantic parser model for the Quantity class."""
-
-    quantity: float | int
-    unit: UnitPdt
-
-    def to_quantity(self, unit_possible: dict[str, Unit]):
-        return Quantity(self.quantity, unit_possible[self.unit.name])
-
-
-class ProductPdt(BaseModel):
-    """Pydantic parser model for the Product class."""
-
-    name: str
-    iri: AnyUrl | None
-    reference_quantity: QuantityPdt
-    BoM_id: str | None
-
-
-class BoMPdt(BaseModel):
-    """Pydantic parser model for the BoM class."""
-
-    BoMId: str | None
-    product_quantities: dict[str, QuantityPdt]
-
-
-class ChemicalCompoundPdt(ProductPdt):
-    """Pydantic parser model for the ChemicalCompound class."""
-
-    chemical_formula: str
-    reference_quantity: QuantityPdt
+def validate_columns(df: pd.DataFrame, table: str, columns: dict[str, object]) -> dict[str, list]:
+    """Validate whole columns of a table at once with pydantic and return them as lists of validated values."""
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        err_msg = f"Missing columns {missing} in {table}"
+        raise ValueError(err_msg)
+    return {
+        column: _column_adapter(column_type).validate_python(df[column].tolist())
+        for column, column_type in columns.items()
+    }
 
 
 ### RecyclingProcess parsers ###
-
-
 class ProcessLCIPdt(BaseModel):
     """Pydantic parser model for the ProcessLCI class."""
 
     lci_id: str
     relative_lci_output: list[tuple[str, str, float]]
     relative_lci_input: list[tuple[str, str, float]]
-
-
-class RecyclingProcess(BaseModel):
-    """Pydantic parser model for the RecyclingProcess class."""
-
-    name: str
-    lci_input: ProcessLCIPdt
-class RecyclingProcessPdt(BaseModel):
-    process_name: str
-    fixed_input_bom_id: str
-    relative_lci: ProcessLCIPdt
-
-class FixedLCIPdt(BaseModel):
-    lci_id: str
-    ref_to_product_list: dict[str,list[str]]
-
@@ -0,0 +1,165 @@
+"""Synthetic inventories of configurable size and shape, written in the CSV layout read by Inventory.create_from_file.
+
+Usage: python -m batterway.datamodel.parser.synthetic FOLDER [--n-raw 50] [--n-per-level 30] [--depth 3] ...
+
+Rows are written as they are generated, and the same seed always gives the same files.
+"""
+
+import argparse
+import csv
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+
+LEVEL_NAMES = ("cell", "module", "pack")
+# Formulas given in turn to the raw materials, which are all written as chemical compounds
+RAW_FORMULAS = ("Ni", "Co", "Li2CO3", "MnO2", "Al2O3", "Cu", "Fe", "C", "SiO2", "CaO")
+UNIT_IRI = "https://vocab.sentier.dev/simapro/unit/kg"
+
+
+def _bom_children(
+    rng: np.random.Generator, n_parents: int, n_lower: int, width: int, sharing: float
+) -> Iterator[np.ndarray]:
+    """Positions in the lower level of the BoM entries of each parent.
+
+    Each entry reuses a lower level product already in the BoM of another parent with probability sharing, and
+    takes a product not used yet otherwise, as long as one remains.
+    """
+    order = rng.permutation(n_lower)
+    used = 0
+    width = min(width, n_lower)
+    for _ in range(n_parents):
+        children: dict[int, None] = {}
+        for draw in rng.random(width):
+            if used < n_lower and (draw >= sharing or used <= len(children)):
+                child = order[used]
+                used += 1
+            else:
+                child = order[rng.integers(used)]
+                while child in children:
+                    child = order[rng.integers(used)]
+            children[child] = None
+        yield np.fromiter(children, dtype=np.int64, count=len(children))
+
+
+def write_inventory(
+    folder: Path,
+    n_raw: int = 50,
+    n_per_level: int = 30,
+    depth: int = 3,
+    width: int = 5,
+    sharing: float = 0.5,
+    n_routes: int = 1,
+    relation_density: float = 0.01,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic inventory into folder and return it.
+
+    n_raw raw materials are assembled into depth levels of n_per_level products (cells, modules, packs, then generic
+    levels), each with a BoM of width products from the level below, of which a share sharing reuses products already
+    in another BoM (see _bom_children). Every route is one recycling process, taking its share of the top level
+    products under the "Feed" label and every raw material under its own label. Its relative LCI relates each
+    (label, product) pair with probability relation_density, as an input or an output with equal chance.
+
+    Peak memory is O(products): every product name is held while writing, the rows are not.
+    """
+    if not 0.0 <= sharing <= 1.0 or not 0.0 <= relation_density <= 1.0:
+        err_msg = f"sharing ({sharing}) and relation_density ({relation_density}) must be within [0, 1]"
+        raise ValueError(err_msg)
+    if min(n_raw, n_per_level, depth, width, n_routes) < 1:
+        raise ValueError("n_raw, n_per_level, depth, width and n_routes must be positive")
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    raws = [f"raw_{i}" for i in range(n_raw)]
+    levels = [raws]
+    for d in range(depth):
+        prefix = LEVEL_NAMES[d] if d < len(LEVEL_NAMES) else f"level{d}"
+        levels.append([f"{prefix}_{i}" for i in range(n_per_level)])
+
+    def write_table(name: str, header: list[str], rows) -> None:
+        with folder.joinpath(name).open("w", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(header)
+            w.writerows(rows)
+
+    product_header = ["name", "iri", "reference_quantity", "unit", "BoM_id"]
+    write_table("units.csv", ["name", "iri"], [["kg", UNIT_IRI]])
+    write_table(
+        "chemical_compounds.csv",
+        [*product_header, "chemical_formula"],
+        (
+            [name, f"https://example.com/{name}", 1, "kg", "", RAW_FORMULAS[i % len(RAW_FORMULAS)]]
+            for i, name in enumerate(raws)
+        ),
+    )
+    write_table(
+        "products.csv",
+        product_header,
+        ([name, f"https://example.com/{name}", 1, "kg", name] for level in levels[1:] for name in level),
+    )
+
+    def bom_rows():
+        for lower, level in zip(levels, levels[1:]):
+            for name, children in zip(level, _bom_children(rng, len(level), len(lower), width, sharing)):
+                for child, share in zip(children, rng.dirichlet(np.ones(len(children)))):
+                    yield [name, lower[child], share, "kg"]
+
+    write_table("BoM.csv", ["BoMId", "Material", "Quantity", "Unit"], bom_rows())
+
+    write_table(
+        "fixedlci.csv",
+        ["lci_id", "product", "ref_in_rel_lci"],
+        (
+            row
+            for route in range(n_routes)
+            for row in [
+                *([f"lci-route-{route + 1}", name, "Feed"] for name in levels[-1][route::n_routes]),
+                *([f"lci-route-{route + 1}", name, name] for name in raws),
+            ]
+        ),
+    )
+
+    all_products = [name for level in levels for name in level]
+    labels = ["Feed", *raws]
+
+    def relation_rows():
+        # Routes one after the other, so that the file can be streamed by lci_id
+        for route in range(n_routes):
+            for label in labels:
+                n_relations = rng.binomial(len(all_products), relation_density)
+                influenced = np.sort(rng.choice(len(all_products), size=n_relations, replace=False))
+                directions = rng.random(n_relations) < 0.5
+                ratios = rng.uniform(0.0, 1.0, size=n_relations)
+                for product, is_input, ratio in zip(influenced, directions, ratios):
+                    direction = "input" if is_input else "output"
+                    yield [f"route{route + 1}", direction, label, all_products[product], ratio, "kg"]
+
+    write_table("lci_relative.csv", ["lci_id", "direction", "influencer", "influenced", "qty", "unit"], relation_rows())
+
+    write_table(
+        "recycling_process.csv",
+        ["process_name", "fixed_input_bom_id", "relative_lci_id"],
+        ([f"recycling_process_{i}", f"lci-route-{i}", f"route{i}"] for i in range(1, n_routes + 1)),
+    )
+    return folder
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--n-raw", type=int, default=50)
+    parser.add_argument("--n-per-level", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--sharing", type=float, default=0.5)
+    parser.add_argument("--n-routes", type=int, default=1)
+    parser.add_argument("--relation-density", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = vars(parser.parse_args(argv))
+    write_inventory(args.pop("folder"), **args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Opt-in tracing and per-stage timing of the batterway computations.
+
+Tracing goes through the standard logging module: the "batterway" loggers are silent unless the application sets a
+DEBUG level and a handler on them, and the BoMs passed as log arguments are only formatted when a record is emitted.
+Timing is collected by stage_timer, which is disabled by default and costs a single attribute check per stage when off.
+"""
+
+import threading
+import time
+from contextlib import nullcontext
+
+_NO_TIMING = nullcontext()
+
+
+class _StageMeasure:
+    def __init__(self, timer: "StageTimer", stage: str):
+        self.timer = timer
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        # Processes may be evaluated from several threads, so the read-modify-write of a counter is serialized
+        with self.timer.lock:
+            calls, seconds = self.timer.counters.get(self.stage, (0, 0.0))
+            self.timer.counters[self.stage] = (calls + 1, seconds + elapsed)
+
+
+class StageTimer:
+    """Call count and cumulative wall-clock time per computation stage.
+
+    The stages recorded by the package are "flattening", "relation_application" and "bom_construction".
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.counters: dict[str, tuple[int, float]] = {}
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = {}
+
+    def measure(self, stage: str) -> _StageMeasure | nullcontext:
+        """Context manager timing the enclosed block under the given stage name, when the timer is enabled."""
+        return _StageMeasure(self, stage) if self.enabled else _NO_TIMING
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Copy of the counters as {stage: {"calls": ..., "seconds": ...}}."""
+        with self.lock:
+            counters = dict(self.counters)
+        return {stage: {"calls": calls, "seconds": seconds} for stage, (calls, seconds) in counters.items()}
+
+
+stage_timer = StageTimer()
@@ -0,0 +1,220 @@
+"""Elemental mass balance of recycling processes and routes, checked for many scenarios at once."""
+
+import numpy as np
+import pandas as pd
+from chempy.util.periodic import symbols
+
+from batterway.datamodel.generic.chemistry import ElementMassFractions
+from batterway.datamodel.generic.flattening import default_flattener
+from batterway.datamodel.generic.process import CompiledRelations, RecyclingProcess, RecyclingRoute
+
+
+class MassBalanceReport:
+    """Elemental inflows and outflows of a process or a route, as (scenarios x elements) arrays.
+
+    Inflows are the elements of the final BoM of the fixed inputs plus those of the influenced inputs; outflows are
+    those of the influenced outputs. An element is balanced in a scenario when |outflow - inflow| is at most
+    abs_tol + rel_tol * max(inflow, outflow). Flows of products without a known composition are not counted; their
+    names are listed in unresolved.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        elements: list[str],
+        inflow: np.ndarray,
+        outflow: np.ndarray,
+        unresolved: list[str],
+        rel_tol: float,
+        abs_tol: float,
+        index: pd.Index | None = None,
+    ):
+        self.name: str = name
+        self.elements: list[str] = elements
+        self.inflow: np.ndarray = inflow
+        self.outflow: np.ndarray = outflow
+        self.unresolved: list[str] = unresolved
+        self.rel_tol: float = rel_tol
+        self.abs_tol: float = abs_tol
+        self.index: pd.Index | None = index
+
+    @property
+    def imbalance(self) -> np.ndarray:
+        """Outflow minus inflow of each element."""
+        return self.outflow - self.inflow
+
+    @property
+    def relative_imbalance(self) -> np.ndarray:
+        """Imbalance relative to the larger of inflow and outflow, 0 for elements without any flow."""
+        scale = np.maximum(np.abs(self.inflow), np.abs(self.outflow))
+        return np.divide(self.imbalance, scale, out=np.zeros_like(scale), where=scale > 0)
+
+    @property
+    def element_balanced(self) -> np.ndarray:
+        """(scenarios x elements) mask of the balanced elements."""
+        scale = np.maximum(np.abs(self.inflow), np.abs(self.outflow))
+        return np.abs(self.imbalance) <= self.abs_tol + self.rel_tol * scale
+
+    @property
+    def balanced(self) -> np.ndarray:
+        """Scenarios in which every element is balanced."""
+        return self.element_balanced.all(axis=1)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Imbalance of each element per scenario, and whether the scenario is balanced."""
+        table = pd.DataFrame(self.imbalance, index=self.index, columns=self.elements)
+        table["balanced"] = self.balanced
+        return table
+
+
+class MassBalanceChecker:
+    """Elemental mass balance of a recycling process, from element matrices built once per compiled relations.
+
+    Element contents come from the chemical formulas of ChemicalCompound products and from products named after an
+    element, which are taken as pure. Checking a batch of scenarios then costs one batch evaluation and three matrix
+    products.
+    """
+
+    def __init__(self, process: RecyclingProcess, rel_tol: float = 1e-6, abs_tol: float = 1e-9):
+        self.process: RecyclingProcess = process
+        self.rel_tol: float = rel_tol
+        self.abs_tol: float = abs_tol
+        # Element matrices, built from the compiled relations of the process on first use
+        self.elements: list[str] = []
+        self.input_elements: np.ndarray | None = None
+        self.influenced_input_elements: np.ndarray | None = None
+        self.output_elements: np.ndarray | None = None
+        self.unresolved: list[str] = []
+        self.__compiled: CompiledRelations | None = None
+
+    def __prepare(self) -> CompiledRelations:
+        compiled = self.process.compiled_relations
+        if compiled is self.__compiled:
+            return compiled
+        final_quantities = {
+            p: default_flattener.final_quantities(p) if p.bom is not None else {p: (1.0, None)}
+            for p in compiled.input_products
+        }
+        raw_products = list(dict.fromkeys(raw for quantities in final_quantities.values() for raw in quantities))
+        fractions = ElementMassFractions(
+            raw_products + compiled.input_influenced + compiled.output_influenced, pure_elements=True
+        )
+        self.elements = fractions.elements
+        raw_rows = dict(zip(raw_products, fractions.rows(raw_products)))
+        # Elements contained in one reference quantity of each fixed input, through its final BoM
+        self.input_elements = np.zeros((len(compiled.input_products), len(self.elements)))
+        for i, quantities in enumerate(final_quantities.values()):
+            for raw, (value, _) in quantities.items():
+                self.input_elements[i] += value * raw_rows[raw]
+        self.influenced_input_elements = fractions.rows(compiled.input_influenced)
+        self.output_elements = fractions.rows(compiled.output_influenced)
+        self.unresolved = sorted(
+            {p.name for p in raw_products + compiled.input_influenced + compiled.output_influenced}
+            - {p.name for p in fractions.compounds}
+        )
+        self.__compiled = compiled
+        return compiled
+
+    def flows(self, input_qty: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Elemental flows for a (scenarios x input_products) array of fixed inputs.
+
+        Returns the elements of the fixed inputs, of the influenced inputs and of the outputs, and the output
+        quantities over compiled_relations.output_influenced (0 when absent), for chaining processes.
+        """
+        compiled = self.__prepare()
+        flat_qty, flat_present = compiled.flatten(input_qty)
+        in_qty, in_present, out_qty, out_present = compiled.apply(flat_qty, flat_present)
+        out_qty = np.where(out_present, out_qty, 0.0)
+        return (
+            input_qty @ self.input_elements,
+            np.where(in_present, in_qty, 0.0) @ self.influenced_input_elements,
+            out_qty @ self.output_elements,
+            out_qty,
+        )
+
+    def check(self, feeds: "pd.DataFrame | np.ndarray", product_names: list[str] | None = None) -> MassBalanceReport:
+        """Mass balance of every scenario of feeds, given as for RecyclingProcess.evaluate_batch."""
+        input_qty, index = self.process.feed_array(feeds, product_names)
+        fixed_in, influenced_in, out, _ = self.flows(input_qty)
+        return MassBalanceReport(
+            self.process.name,
+            self.elements,
+            fixed_in + influenced_in,
+            out,
+            self.unresolved,
+            self.rel_tol,
+            self.abs_tol,
+            index,
+        )
+
+
+def check_route(
+    route: RecyclingRoute,
+    feeds: "pd.DataFrame | np.ndarray",
+    product_names: list[str] | None = None,
+    rel_tol: float = 1e-6,
+    abs_tol: float = 1e-9,
+) -> dict[str, MassBalanceReport]:
+    """Mass balance of each process of a route and of the whole route, for every scenario of feeds.
+
+    feeds are the fixed inputs of the first process, given as for RecyclingProcess.evaluate_batch; each following
+    process is fed with the outputs of the previous one that are among its inputs, as in RecyclingRoute.run. The
+    reports are keyed by process name, plus the route_id for the whole route, in which the flows passed between
+    processes cancel out.
+    """
+    if not len(route.process_sequence):
+        err_msg = f"Route {route.route_id} has no process"
+        raise ValueError(err_msg)
+    checkers = [MassBalanceChecker(process, rel_tol, abs_tol) for process in route.process_sequence]
+    input_qty, index = route.process_sequence[0].feed_array(feeds, product_names)
+    reports: dict[str, MassBalanceReport] = {}
+    process_flows = []
+    out_qty = None
+    for position, checker in enumerate(checkers):
+        if position:
+            previous_process = checkers[position - 1].process
+            output_positions = {p: j for j, p in enumerate(previous_process.compiled_relations.output_influenced)}
+            input_products = checker.process.compiled_relations.input_products
+            chained = [(i, output_positions[p]) for i, p in enumerate(input_products) if p in output_positions]
+            if not len(chained):
+                err_msg = f"No product produced by {previous_process.name} used by {checker.process.name}"
+                raise ValueError(err_msg)
+            targets, sources = zip(*chained)
+            input_qty = np.zeros((len(out_qty), len(input_products)))
+            input_qty[:, list(targets)] = out_qty[:, list(sources)]
+        fixed_in, influenced_in, out, out_qty = checker.flows(input_qty)
+        reports[checker.process.name] = MassBalanceReport(
+            checker.process.name,
+            checker.elements,
+            fixed_in + influenced_in,
+            out,
+            checker.unresolved,
+            rel_tol,
+            abs_tol,
+            index,
+        )
+        process_flows.append((checker.elements, fixed_in, influenced_in, out))
+
+    # The fixed inputs of every process but the first are outputs of the previous one, internal to the route
+    elements = [elem for elem in symbols if any(elem in checker.elements for checker in checkers)]
+    route_in = np.zeros((len(input_qty), len(elements)))
+    route_out = np.zeros((len(input_qty), len(elements)))
+    for position, (process_elements, fixed_in, influenced_in, out) in enumerate(process_flows):
+        columns = [elements.index(elem) for elem in process_elements]
+        route_in[:, columns] += influenced_in
+        route_out[:, columns] += out
+        if position:
+            route_out[:, columns] -= fixed_in
+        else:
+            route_in[:, columns] += fixed_in
+    reports[route.route_id] = MassBalanceReport(
+        route.route_id,
+        elements,
+        route_in,
+        route_out,
+        sorted({name for checker in checkers for name in checker.unresolved}),
+        rel_tol,
+        abs_tol,
+        index,
+    )
+    return reports
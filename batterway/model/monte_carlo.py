@@ -0,0 +1,240 @@
+"""Monte Carlo propagation of the uncertainty of relation ratios and BoM quantities.
+
+Samples are drawn and evaluated as (samples x coefficients) arrays over the compiled relations of a process, or over
+the BoM edges of a product graph, so the object graph is never copied per sample. Samples are split into chunks of
+fixed size, each with its own random stream spawned from one seed, which makes the results reproducible whatever the
+number of workers the chunks are spread over.
+"""
+
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batterway.datamodel.generic.flattening import default_flattener, topological_order
+from batterway.datamodel.generic.process import CompiledRelations, RecyclingProcess
+from batterway.datamodel.generic.product import Product
+
+DISTRIBUTIONS = ("lognormal", "normal", "uniform")
+
+
+def draw_multipliers(rng: np.random.Generator, size: tuple[int, int], cv: float, distribution: str) -> np.ndarray:
+    """Random multipliers of mean 1 and coefficient of variation cv, applied to point estimates.
+
+    "lognormal" keeps the sign of every coefficient, "normal" and "uniform" are symmetric around the point estimate.
+    """
+    if distribution == "lognormal":
+        sigma = np.sqrt(np.log1p(cv**2))
+        return rng.lognormal(-(sigma**2) / 2, sigma, size)
+    if distribution == "normal":
+        return 1.0 + cv * rng.standard_normal(size)
+    if distribution == "uniform":
+        half_width = cv * np.sqrt(3.0)
+        return rng.uniform(1.0 - half_width, 1.0 + half_width, size)
+    err_msg = f"Unknown distribution {distribution}, expected one of {DISTRIBUTIONS}"
+    raise ValueError(err_msg)
+
+
+class BoMSampler:
+    """BoM edges of a product graph, evaluated into final BoMs for many samples of the edge quantities at once."""
+
+    def __init__(self, roots: Iterable[Product]):
+        order = topological_order(roots)
+        self.raw_products: list[Product] = [p for p in order if p.bom is None]
+        self.raw_index: dict[Product, int] = {p: i for i, p in enumerate(self.raw_products)}
+        self.composites: list[Product] = [p for p in order if p.bom is not None]
+        self.composite_index: dict[Product, int] = {p: i for i, p in enumerate(self.composites)}
+        # Edges grouped by parent, parents in topological order
+        self.edges: list[tuple[int, Product, float]] = [
+            (self.composite_index[parent], child, p_instance.qty.value)
+            for parent in self.composites
+            for child, p_instance in parent.bom.product_quantities.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def final_quantities(self, multipliers: np.ndarray) -> np.ndarray:
+        """(samples x composites x raw products) final BoMs for (samples x edges) multipliers of the edge quantities."""
+        n_samples = multipliers.shape[0]
+        final = np.zeros((n_samples, len(self.composites), len(self.raw_products)))
+        for e, (parent, child, qty) in enumerate(self.edges):
+            scaled = qty * multipliers[:, e]
+            if child.bom is None:
+                final[:, parent, self.raw_index[child]] += scaled
+            else:
+                final[:, parent] += scaled[:, None] * final[:, self.composite_index[child]]
+        return final
+
+
+class MonteCarloResult:
+    """Sampled flows, one row per sample and one column per (flow, product name)."""
+
+    def __init__(self, samples: pd.DataFrame):
+        self.samples: pd.DataFrame = samples
+
+    def summary(self, percentiles: Iterable[float] = (5, 50, 95)) -> pd.DataFrame:
+        """Mean, standard deviation and percentiles of every sampled flow."""
+        percentiles = list(percentiles)
+        values = self.samples.to_numpy()
+        table = pd.DataFrame(
+            np.percentile(values, percentiles, axis=0).T,
+            index=self.samples.columns,
+            columns=[f"p{p:g}" for p in percentiles],
+        )
+        table.insert(0, "std", values.std(axis=0, ddof=1) if len(values) > 1 else np.nan)
+        table.insert(0, "mean", values.mean(axis=0))
+        return table
+
+
+class _ProcessModel:
+    """Numeric model of a process evaluation, with sampled relation ratios and BoM quantities."""
+
+    def __init__(self, compiled: CompiledRelations, relation_cv: float, bom_cv: float, distribution: str):
+        self.compiled: CompiledRelations = compiled
+        self.relation_cv: float = relation_cv
+        self.bom_cv: float = bom_cv
+        self.distribution: str = distribution
+        self.bom_sampler: BoMSampler | None = None
+        if bom_cv > 0:
+            self.bom_sampler = BoMSampler(compiled.input_products)
+            # Source of every flattening coefficient: a (composite, raw) cell of the final BoMs, or a constant 1
+            sources = []
+            for product in compiled.input_products:
+                if product.bom is not None:
+                    composite = self.bom_sampler.composite_index[product]
+                    final_quantities = default_flattener.final_quantities(product)
+                    sources += [(composite, self.bom_sampler.raw_index[raw]) for raw in final_quantities]
+                else:
+                    sources.append(None)
+            sources += [None] * len(compiled.input_products)
+            sampled = [i for i, source in enumerate(sources) if source is not None]
+            self.sampled_entries = np.array(sampled, dtype=np.int64)
+            self.sampled_composites = np.array([sources[i][0] for i in sampled], dtype=np.int64)
+            self.sampled_raws = np.array([sources[i][1] for i in sampled], dtype=np.int64)
+
+    def __call__(self, seed: np.random.SeedSequence, n_samples: int, input_qty: np.ndarray) -> np.ndarray:
+        compiled = self.compiled
+        rng = np.random.default_rng(seed)
+        flat_values = None
+        if self.bom_sampler is not None:
+            final = self.bom_sampler.final_quantities(
+                draw_multipliers(rng, (n_samples, len(self.bom_sampler)), self.bom_cv, self.distribution)
+            )
+            flat_values = np.tile(compiled.flat_values, (n_samples, 1))
+            flat_values[:, self.sampled_entries] = final[:, self.sampled_composites, self.sampled_raws]
+        input_values = compiled.input_values * draw_multipliers(
+            rng, (n_samples, len(compiled.input_values)), self.relation_cv, self.distribution
+        )
+        output_values = compiled.output_values * draw_multipliers(
+            rng, (n_samples, len(compiled.output_values)), self.relation_cv, self.distribution
+        )
+        input_qty = np.broadcast_to(input_qty, (n_samples, len(input_qty)))
+        flat_qty, flat_present = compiled.flatten(input_qty, flat_values)
+        in_qty, in_present, out_qty, out_present = compiled.apply(flat_qty, flat_present, input_values, output_values)
+        return np.hstack([np.where(in_present, in_qty, 0.0), np.where(out_present, out_qty, 0.0)])
+
+
+class _FinalBoMModel:
+    """Numeric model of the final BoM of one product, with sampled BoM quantities."""
+
+    def __init__(self, product: Product, bom_cv: float, distribution: str):
+        self.bom_sampler: BoMSampler = BoMSampler([product])
+        self.composite: int = self.bom_sampler.composite_index[product]
+        self.bom_cv: float = bom_cv
+        self.distribution: str = distribution
+
+    def __call__(self, seed: np.random.SeedSequence, n_samples: int, factor: float) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        multipliers = draw_multipliers(rng, (n_samples, len(self.bom_sampler)), self.bom_cv, self.distribution)
+        return factor * self.bom_sampler.final_quantities(multipliers)[:, self.composite]
+
+
+# Model and argument of the current worker process, set once by the pool initializer
+_worker_model = None
+_worker_argument = None
+
+
+def _init_worker(model, argument) -> None:
+    global _worker_model, _worker_argument
+    _worker_model, _worker_argument = model, argument
+
+
+def _run_chunk(seed: np.random.SeedSequence, n_samples: int) -> np.ndarray:
+    return _worker_model(seed, n_samples, _worker_argument)
+
+
+def _simulate(model, n_samples: int, argument, seed: int | None, chunk_size: int, max_workers: int) -> np.ndarray:
+    """Evaluate model on chunks of samples, each with its own random stream, possibly on several processes.
+
+    Each worker receives the model once, through the pool initializer, and each task only carries a seed and a size.
+    """
+    sizes = [min(chunk_size, n_samples - start) for start in range(0, n_samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if max_workers <= 1 or len(sizes) <= 1:
+        return np.vstack([model(chunk_seed, size, argument) for chunk_seed, size in zip(seeds, sizes)])
+    with ProcessPoolExecutor(
+        min(max_workers, len(sizes)), initializer=_init_worker, initargs=(model, argument)
+    ) as pool:
+        futures = [pool.submit(_run_chunk, chunk_seed, size) for chunk_seed, size in zip(seeds, sizes)]
+        return np.vstack([future.result() for future in futures])
+
+
+def simulate_process(
+    process: RecyclingProcess,
+    products_qty: dict[str, float],
+    n_samples: int,
+    relation_cv: float = 0.1,
+    bom_cv: float = 0.0,
+    distribution: str = "lognormal",
+    seed: int | None = None,
+    chunk_size: int = 10_000,
+    max_workers: int = 1,
+) -> MonteCarloResult:
+    """Sample the influenced flows of a process for fixed inputs, by product name, as in RecyclingProcess.evaluate.
+
+    Every relation ratio is multiplied by an independent random multiplier of coefficient of variation relation_cv,
+    and, when bom_cv is positive, every BoM quantity of the input products by one of coefficient of variation bom_cv.
+    The process is not modified. Columns are ("input" or "output", product name).
+    """
+    if n_samples <= 0:
+        raise ValueError("n_samples must be positive")
+    compiled = process.compiled_relations
+    input_qty = process.feed_array(pd.DataFrame([products_qty]))[0][0]
+    model = _ProcessModel(compiled, relation_cv, bom_cv, distribution)
+    samples = _simulate(model, n_samples, input_qty, seed, chunk_size, max_workers)
+    columns = pd.MultiIndex.from_tuples(
+        [("input", p.name) for p in compiled.input_influenced]
+        + [("output", p.name) for p in compiled.output_influenced],
+        names=["flow", "product"],
+    )
+    return MonteCarloResult(pd.DataFrame(samples, columns=columns))
+
+
+def simulate_final_bom(
+    product: Product,
+    n_samples: int,
+    bom_cv: float = 0.1,
+    qty: float = 1.0,
+    distribution: str = "lognormal",
+    seed: int | None = None,
+    chunk_size: int = 10_000,
+    max_workers: int = 1,
+) -> MonteCarloResult:
+    """Sample the final BoM of qty reference quantities of a product, as in Product.get_final_bom.
+
+    Every BoM quantity of the product graph is multiplied by an independent random multiplier of coefficient of
+    variation bom_cv. Columns are ("final", raw product name).
+    """
+    if n_samples <= 0:
+        raise ValueError("n_samples must be positive")
+    if product.bom is None:
+        err_msg = f"{product.name} has no BoM to sample"
+        raise ValueError(err_msg)
+    model = _FinalBoMModel(product, bom_cv, distribution)
+    samples = _simulate(model, n_samples, qty, seed, chunk_size, max_workers)
+    columns = pd.MultiIndex.from_tuples(
+        [("final", p.name) for p in model.bom_sampler.raw_products], names=["flow", "product"]
+    )
+    return MonteCarloResult(pd.DataFrame(samples, columns=columns))
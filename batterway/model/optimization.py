@@ -0,0 +1,120 @@
+"""Feed-mix optimization of recycling processes and routes as linear programs."""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+from scipy.optimize import linprog
+
+from batterway.datamodel.generic.process import RecyclingProcess, RecyclingRoute
+
+# A flow is an output product name of the last process, a ("input" | "output", product name) pair for the last
+# process, or a (process name, "input" | "output", product name) triple
+FlowSpec = str | tuple[str, str] | tuple[str, str, str]
+
+
+class FeedMixResult:
+    """Outcome of a feed-mix optimization, with the optimal feed and the flows named in the problem."""
+
+    def __init__(self, success: bool, message: str, feed: dict[str, float], objective: float, flows: dict):
+        self.success: bool = success
+        self.message: str = message
+        self.feed: dict[str, float] = feed
+        self.objective: float = objective
+        self.flows: dict[FlowSpec, float] = flows
+
+
+class FeedMixOptimizer:
+    """Linear program over the fixed input quantities of a process, or of the first process of a route.
+
+    Every computed flow is linear in the feed (see RecyclingProcess.jacobian), so objectives and constraints on flows
+    are rows of the Jacobians restricted to the feed products. Problems are solved by scipy's linprog with HiGHS.
+    """
+
+    def __init__(self, target: RecyclingProcess | RecyclingRoute, feed_products: Sequence[str] | None = None):
+        jacobians = target.jacobian() if isinstance(target, RecyclingRoute) else [target.jacobian()]
+        input_positions = {p.name: i for i, p in enumerate(jacobians[0].fixed_inputs)}
+        self.feed_products: list[str] = list(feed_products or input_positions)
+        missing = [name for name in self.feed_products if name not in input_positions]
+        if missing:
+            err_msg = f"Products {missing} are not inputs of {jacobians[0].process_name}"
+            raise ValueError(err_msg)
+        columns = [input_positions[name] for name in self.feed_products]
+        self.last_process: str = jacobians[-1].process_name
+        self.flow_rows: dict[tuple[str, str, str], np.ndarray] = {}
+        for jacobian in jacobians:
+            for kind, products, matrix in (
+                ("input", jacobian.input_influenced, jacobian.to_input),
+                ("output", jacobian.output_influenced, jacobian.to_output),
+            ):
+                dense = matrix[:, columns].toarray()
+                for product, row in zip(products, dense):
+                    self.flow_rows[(jacobian.process_name, kind, product.name)] = row
+
+    def flow_row(self, flow: FlowSpec) -> np.ndarray:
+        """Coefficients of a flow over the feed products."""
+        if isinstance(flow, str):
+            key = (self.last_process, "output", flow)
+        elif len(flow) == 2:
+            key = (self.last_process, *flow)
+        else:
+            key = tuple(flow)
+        if key not in self.flow_rows:
+            err_msg = f"Unknown flow {flow}: no influenced {key[1]} {key[2]} in {key[0]}"
+            raise ValueError(err_msg)
+        return self.flow_rows[key]
+
+    def solve(
+        self,
+        objective: Mapping[FlowSpec, float],
+        maximize: bool = False,
+        capacity: float | None = None,
+        feed_bounds: Mapping[str, tuple[float | None, float | None]] | None = None,
+        flow_bounds: Mapping[FlowSpec, tuple[float | None, float | None]] | None = None,
+    ) -> FeedMixResult:
+        """Find the feed minimizing (or maximizing) the weighted sum of flows in objective.
+
+        capacity bounds the total feed quantity, feed_bounds the quantity of single feed products (0 and unbounded by
+        default), and flow_bounds any flow, e.g. a reagent budget or a minimum recovery. A None bound is open.
+        """
+        if not len(objective):
+            raise ValueError("Empty objective")
+        sign = -1.0 if maximize else 1.0
+        cost = sign * sum(weight * self.flow_row(flow) for flow, weight in objective.items())
+
+        rows, limits = [], []
+        if capacity is not None:
+            rows.append(np.ones(len(self.feed_products)))
+            limits.append(capacity)
+        for flow, (low, high) in (flow_bounds or {}).items():
+            row = self.flow_row(flow)
+            if high is not None:
+                rows.append(row)
+                limits.append(high)
+            if low is not None:
+                rows.append(-row)
+                limits.append(-low)
+
+        bounds = [(0.0, None)] * len(self.feed_products)
+        for name, (low, high) in (feed_bounds or {}).items():
+            if name not in self.feed_products:
+                err_msg = f"{name} is not a feed product of the problem"
+                raise ValueError(err_msg)
+            bounds[self.feed_products.index(name)] = (0.0 if low is None else low, high)
+
+        solution = linprog(
+            cost,
+            A_ub=np.array(rows) if rows else None,
+            b_ub=np.array(limits) if limits else None,
+            bounds=bounds,
+            method="highs",
+        )
+        if not solution.success:
+            return FeedMixResult(False, solution.message, {}, np.nan, {})
+        named_flows = list(objective) + list(flow_bounds or {})
+        return FeedMixResult(
+            True,
+            solution.message,
+            dict(zip(self.feed_products, solution.x.tolist())),
+            sign * solution.fun,
+            {flow: float(self.flow_row(flow) @ solution.x) for flow in named_flows},
+        )
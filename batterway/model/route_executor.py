@@ -0,0 +1,131 @@
+"""Evaluation of many feed scenarios through a recycling route, fanned out over worker processes."""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from batterway.datamodel.generic.process import RecyclingRoute
+from batterway.datamodel.parser.Inventory import Inventory
+
+logger = logging.getLogger(__name__)
+
+# Inventory of the current worker process, inherited through fork or loaded once from a snapshot by the initializer
+_worker_inventory: Inventory | None = None
+
+
+def _load_worker_inventory(snapshot: str) -> None:
+    global _worker_inventory
+    with open(snapshot, "rb") as f:
+        _worker_inventory = pickle.load(f)
+
+
+def _run_scenarios(
+    process_names: tuple[str, ...], scenarios: list[tuple[int, dict[str, float]]]
+) -> list[tuple[int, dict[tuple[str, str], float]]]:
+    """Run a chunk of scenarios through the route built from the worker inventory."""
+    route = RecyclingRoute("route", [_worker_inventory.get_process(name) for name in process_names])
+    results = []
+    for position, products_qty in scenarios:
+        results.append(
+            (
+                position,
+                {
+                    (result.process_name, product.name): p_instance.qty.value
+                    for result in route.run(products_qty)
+                    for product, p_instance in result.computed_output_bom.product_quantities.items()
+                },
+            )
+        )
+    return results
+
+
+class RouteExecutor:
+    """Run independent feed scenarios through a sequence of processes of an inventory, on several worker processes.
+
+    Each worker receives the inventory once: on platforms supporting fork it is inherited from the parent process,
+    otherwise it is pickled once to a snapshot file that every worker loads at start-up. Tasks then only carry the
+    process names and the scenario feeds. With max_workers=1 the scenarios are run in the calling process.
+    """
+
+    def __init__(
+        self,
+        inventory: Inventory,
+        process_names: Sequence[str],
+        max_workers: int | None = None,
+        start_method: str | None = None,
+    ):
+        if not len(process_names):
+            raise ValueError("A route needs at least one process")
+        self.inventory: Inventory = inventory
+        self.process_names: tuple[str, ...] = tuple(process_names)
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.start_method: str = start_method
+
+    def run(self, scenarios: "Sequence[dict[str, float]] | pd.DataFrame", chunksize: int | None = None) -> pd.DataFrame:
+        """Run every scenario and gather the computed outputs of each process into one table.
+
+        scenarios is a sequence of feeds of the first process, by product name, or a DataFrame with one column per
+        product and one row per scenario. The result has one row per scenario, in the same order and with the same
+        index for a DataFrame, and (process name, product name) columns; outputs absent from a scenario are 0.
+        """
+        index = None
+        if isinstance(scenarios, pd.DataFrame):
+            index = scenarios.index
+            scenarios = scenarios.to_dict(orient="records")
+        tasks = list(enumerate(scenarios))
+        workers = min(self.max_workers, len(tasks))
+        if chunksize is None:
+            # A few chunks per worker balance the load while amortizing the cost of a task
+            chunksize = max(1, -(-len(tasks) // (4 * max(workers, 1))))
+        chunks = [tasks[i : i + chunksize] for i in range(0, len(tasks), chunksize)]
+        logger.debug("Running %s scenarios in %s chunks on %s workers", len(tasks), len(chunks), workers)
+
+        if workers <= 1:
+            global _worker_inventory
+            _worker_inventory = self.inventory
+            try:
+                results = [result for chunk in chunks for result in _run_scenarios(self.process_names, chunk)]
+            finally:
+                _worker_inventory = None
+        else:
+            results = self.__run_in_pool(chunks, workers)
+
+        rows = dict(results)
+        table = pd.DataFrame([rows[position] for position in range(len(tasks))], index=index)
+        table = table.fillna(0.0)
+        if len(table.columns):
+            table.columns = pd.MultiIndex.from_tuples(table.columns, names=["process", "product"])
+        return table
+
+    def __run_in_pool(self, chunks: list, workers: int) -> list:
+        global _worker_inventory
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "fork":
+            _worker_inventory = self.inventory
+            try:
+                with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                    return self.__gather(pool, chunks)
+            finally:
+                _worker_inventory = None
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = Path(tmp_dir).joinpath("inventory.pkl")
+            with snapshot.open("wb") as f:
+                pickle.dump(self.inventory, f, protocol=5)
+            with ProcessPoolExecutor(
+                workers, mp_context=context, initializer=_load_worker_inventory, initargs=(str(snapshot),)
+            ) as pool:
+                return self.__gather(pool, chunks)
+
+    def __gather(self, pool: ProcessPoolExecutor, chunks: list) -> list:
+        futures = [pool.submit(_run_scenarios, self.process_names, chunk) for chunk in chunks]
+        return [result for future in futures for result in future.result()]
@@ -0,0 +1 @@
+"""Performance benchmarks of batterway, run with ``python -m benchmarks.run``."""
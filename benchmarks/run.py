@@ -0,0 +1,181 @@
+"""Time and peak memory of the main batterway operations on the sample data and on synthetic inventories.
+
+Usage: python -m benchmarks.run [--sizes sample small medium] [--repeat 3] [--output results.json]
+
+Every operation is timed over --repeat runs, then run once more under tracemalloc to record the peak of memory
+allocated by Python and numpy. Results are printed as a table and written as JSON, together with the package version
+and the platform, so that runs can be compared across releases.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from batterway import __version__
+from batterway.datamodel.generic.flattening import default_flattener
+from batterway.datamodel.generic.product import Product, ProductInstance, Quantity, Unit
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.datamodel.parser.synthetic import write_inventory
+
+SAMPLE_DATA = Path(__file__).parent.parent / "data/dataframes"
+
+# Synthetic inventory parameters per size: products and relations grow by about a decade per step. "medium" needs
+# a few GB of memory, mostly for the technosphere final BoMs, and "large" a few tens of GB
+SIZES: dict[str, dict[str, int | float]] = {
+    "tiny": {"n_raw": 10, "n_per_level": 5, "depth": 3, "width": 3, "n_routes": 1, "relation_density": 0.5},
+    "small": {"n_raw": 50, "n_per_level": 30, "depth": 3, "width": 5, "n_routes": 2, "relation_density": 0.3},
+    "medium": {"n_raw": 500, "n_per_level": 3_000, "depth": 3, "width": 10, "n_routes": 2, "relation_density": 0.005},
+    "large": {"n_raw": 2_000, "n_per_level": 30_000, "depth": 4, "width": 10, "n_routes": 4, "relation_density": 0.001},
+}
+
+BATCH_BUDGET = 20_000_000
+# Objects built per class by the memory per object benchmark
+OBJECT_COUNT = 100_000
+
+
+def measure(operation: Callable[[], object], repeat: int, setup: Callable[[], None] | None = None) -> dict[str, float]:
+    """Wall-clock times over repeat runs and peak traced memory of one more run."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_min": min(times),
+        "seconds_median": statistics.median(times),
+        "repeat": repeat,
+        "peak_memory_bytes": peak,
+    }
+
+
+def benchmark_objects(repeat: int) -> list[dict]:
+    """Time and memory per object of building OBJECT_COUNT objects of each data model class.
+
+    Names are built beforehand, so an object accounts for itself and what it owns: a Product its reference Quantity
+    and a ProductInstance its Quantity.
+    """
+    kg = Unit.intern("kg", "https://vocab.sentier.dev/simapro/unit/kg")
+    product = Product("product", "https://example.com/product", Quantity(1.0, kg))
+    names = [f"object_{i}" for i in range(OBJECT_COUNT)]
+    builders = {
+        "Unit": lambda: [Unit(name, "https://example.com/unit") for name in names],
+        "Quantity": lambda: [Quantity(1.0, kg) for _ in names],
+        "Product": lambda: [Product(name, "https://example.com/product", Quantity(1.0, kg)) for name in names],
+        "ProductInstance": lambda: [ProductInstance(product, Quantity(1.0, kg)) for _ in names],
+    }
+    results = []
+    for class_name, build in builders.items():
+        timing = measure(build, repeat)
+        results.append(
+            {"dataset": "objects", "operation": f"build_{class_name}", "params": {"objects": OBJECT_COUNT}}
+            | timing
+            | {"bytes_per_object": timing["peak_memory_bytes"] / OBJECT_COUNT}
+        )
+    return results
+
+
+def benchmark_dataset(name: str, folder: Path, repeat: int, n_scenarios: int) -> list[dict]:
+    """Benchmark inventory loading, final BoMs and process evaluation on one inventory folder."""
+    results = []
+
+    def record(operation: str, params: dict, timing: dict[str, float]) -> None:
+        results.append({"dataset": name, "operation": operation, "params": params} | timing)
+
+    record("inventory_load", {}, measure(lambda: Inventory.create_from_file(folder), repeat))
+    inventory = Inventory.create_from_file(folder)
+    products = list(inventory.products.values())
+    record("inventory_lazy_open", {}, measure(lambda: Inventory.open_lazy(folder), repeat))
+
+    composites = [p for p in products if p.bom is not None]
+    record(
+        "get_final_bom_cold",
+        {"products": len(composites)},
+        measure(lambda: [p.get_final_bom() for p in composites], repeat, setup=default_flattener.invalidate),
+    )
+    record(
+        "get_final_bom_warm",
+        {"products": len(composites)},
+        measure(lambda: [p.get_final_bom() for p in composites], repeat),
+    )
+    technosphere = inventory.get_technosphere()
+    demand = technosphere.demand_matrix([{p: 1.0} for p in composites])
+    record(
+        "technosphere_final_boms",
+        {"products": len(technosphere), "demands": len(composites)},
+        measure(lambda: technosphere.final_boms(demand), repeat),
+    )
+
+    for process_name in inventory.process_lcis:
+        process = inventory.get_process(process_name)
+        compiled = process.compiled_relations
+        params = {
+            "process": process_name,
+            "inputs": len(compiled.input_products),
+            "relations": len(compiled.input_values) + len(compiled.output_values),
+        }
+        feed = {p.name: 100.0 for p in compiled.input_products}
+        record("update_fixed_input_lci", params, measure(lambda: process.update_fixed_input_lci(feed), repeat))
+        record("evaluate", params, measure(lambda: process.evaluate(feed), repeat))
+        # Batches hold a (scenarios x flattening entries) array, kept under about 160 MB
+        scenarios = min(n_scenarios, max(1, BATCH_BUDGET // len(compiled.flat_values)))
+        feeds = pd.DataFrame(np.random.default_rng(0).uniform(0, 100, (scenarios, len(feed))), columns=list(feed))
+        record(
+            "evaluate_batch", params | {"scenarios": scenarios}, measure(lambda: process.evaluate_batch(feeds), repeat)
+        )
+    return results
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["sample", "small"], choices=["sample", *SIZES])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenarios", type=int, default=1_000, help="Scenarios of the evaluate_batch benchmark")
+    parser.add_argument("--output", type=Path, help="JSON file to write the results to")
+    args = parser.parse_args(argv)
+
+    results = benchmark_objects(args.repeat)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            if size == "sample":
+                folder = SAMPLE_DATA
+            else:
+                folder = write_inventory(Path(tmp_dir).joinpath(size), **SIZES[size])
+            results += benchmark_dataset(size, folder, args.repeat, args.scenarios)
+
+    report = {
+        "batterway_version": __version__,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+    table = pd.DataFrame(results).drop(columns=["params"])
+    print(table.to_string(index=False))
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
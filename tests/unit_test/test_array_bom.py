@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.array_bom import ArrayBoM, ProductIndex
+from batterway.datamodel.generic.product import BoM, ProductInstance, Quantity
+
+
+def _bom(**quantities: float) -> BoM:
+    products = {"nickel": uc.nickel, "cobalt": uc.cobalt, "steel": uc.steel}
+    return BoM({products[n]: ProductInstance(products[n], Quantity(q, uc.kg)) for n, q in quantities.items()})
+
+
+def test_array_bom_round_trip_and_read_api() -> None:
+    index = ProductIndex()
+    array_bom = ArrayBoM.from_bom(_bom(nickel=0.3, cobalt=0.7), index)
+
+    assert "nickel" in array_bom
+    assert uc.cobalt in array_bom
+    assert uc.steel not in array_bom
+    assert array_bom.quantity_total == pytest.approx(1.0)
+    assert array_bom.product_quantities[uc.nickel].qty.value == pytest.approx(0.3)
+    assert {p.name: pi.qty.value for p, pi in array_bom.to_bom().product_quantities.items()} == {
+        "nickel": 0.3,
+        "cobalt": 0.7,
+    }
+
+
+def test_array_bom_vector_operations() -> None:
+    index = ProductIndex()
+    first = ArrayBoM.from_bom(_bom(nickel=0.3, cobalt=0.7), index)
+    second = ArrayBoM.from_bom(_bom(steel=1.0, nickel=0.1), index)
+
+    total = first + second * 2
+    assert len(index) == 3
+    np.testing.assert_allclose(total.quantities, [0.5, 0.7, 2.0])
+    assert total == ArrayBoM.from_bom(_bom(nickel=0.5, cobalt=0.7, steel=2.0), index)
+    assert set(total.products) == {uc.nickel, uc.cobalt, uc.steel}
+
+    with pytest.raises(ValueError):
+        first + ArrayBoM.from_bom(_bom(nickel=1.0), ProductIndex())
+
+
+def test_array_bom_set_quantity_of_absent_product() -> None:
+    index = ProductIndex()
+    first = ArrayBoM.from_bom(_bom(nickel=0.3), index)
+    view = first.product_quantities
+    ArrayBoM.from_bom(_bom(steel=1.0), index)
+
+    first.set_quantity_of_product("nickel", 0.5)
+    assert first.product_quantities[uc.nickel].qty.value == pytest.approx(0.5)
+    # Like BoM, only the quantities of products already in the BoM can be set
+    for name in ("steel", "cobalt"):
+        with pytest.raises(KeyError):
+            first.set_quantity_of_product(name, 1.0)
+    assert uc.steel not in first
+    assert list(view) == [uc.nickel]
+    with pytest.raises(KeyError):
+        view[uc.steel]
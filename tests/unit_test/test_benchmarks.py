@@ -0,0 +1,15 @@
+import json
+
+from benchmarks.run import main
+
+
+def test_benchmark_runner_writes_report(tmp_path):
+    output = tmp_path / "results.json"
+    report = main(["--sizes", "sample", "tiny", "--repeat", "1", "--scenarios", "10", "--output", str(output)])
+    assert json.loads(output.read_text()) == report
+    assert {"batterway_version", "python", "platform", "timestamp"} <= set(report)
+    operations = {(r["dataset"], r["operation"]) for r in report["results"]}
+    for dataset in ("sample", "tiny"):
+        assert (dataset, "inventory_load") in operations
+        assert (dataset, "evaluate_batch") in operations
+    assert all(r["seconds_min"] >= 0 and r["peak_memory_bytes"] > 0 for r in report["results"])
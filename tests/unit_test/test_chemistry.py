@@ -0,0 +1,42 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.product import ChemicalCompound, Quantity, parse_formula
+from batterway.datamodel.parser.Inventory import Inventory
+
+
+def test_formula_parsing_is_shared() -> None:
+    cobalt_sulfate = ChemicalCompound("cobalt sulfate", "coso4.com", Quantity(1.0, uc.kg), "CoSO4")
+    other = ChemicalCompound("other cobalt sulfate", "coso4.com", Quantity(1.0, uc.kg), "CoSO4")
+    assert parse_formula("CoSO4") is parse_formula("CoSO4")
+    assert other.get_molar_share() == cobalt_sulfate.get_molar_share()
+    assert cobalt_sulfate.get_molar_share()["Co"] == pytest.approx(58.933194 / 154.989194)
+    assert sum(cobalt_sulfate._get_mass_per_element().values()) == pytest.approx(cobalt_sulfate.molar_mass)
+
+
+def test_mass_fraction_matrix_matches_molar_shares() -> None:
+    inventory = Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+    fractions = inventory.get_mass_fractions()
+    assert inventory.get_mass_fractions() is fractions
+    assert isinstance(inventory.get_product("Ca(OH)2"), ChemicalCompound)
+    np.testing.assert_allclose(fractions.matrix.sum(axis=1), 1.0)
+
+    flows = {compound: float(i + 1) for i, compound in enumerate(fractions.compounds)}
+    expected: dict[str, float] = {}
+    for compound, qty in flows.items():
+        for elem, share in compound.get_molar_share().items():
+            expected[elem] = expected.get(elem, 0.0) + share * qty
+    assert fractions.elemental_bom(flows) == pytest.approx(expected)
+
+
+def test_invalid_formula_is_rejected(tmp_path) -> None:
+    data_dir = tmp_path / "dataframes"
+    shutil.copytree(Path(__file__).parent.parent.parent / "data/dataframes/", data_dir)
+    compounds_file = data_dir / "chemical_compounds.csv"
+    compounds_file.write_text(compounds_file.read_text().replace(";Al2(SO4)3", ";AL2(SO4)3"))
+    with pytest.raises(ValueError, match="Invalid chemical_formula 'AL2"):
+        Inventory.create_from_file(data_dir)
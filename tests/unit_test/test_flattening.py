@@ -0,0 +1,69 @@
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.flattening import BoMFlattener, topological_order
+from batterway.datamodel.generic.product import BoM, Product, ProductInstance, Quantity
+
+
+def _cell() -> Product:
+    return Product(
+        "cell",
+        "cell.com",
+        Quantity(1.0, uc.kg),
+        bom=BoM(
+            {
+                uc.nickel: ProductInstance(uc.nickel, Quantity(0.5, uc.kg)),
+                uc.cobalt: ProductInstance(uc.cobalt, Quantity(0.5, uc.kg)),
+            }
+        ),
+    )
+
+
+def test_topological_order_puts_sub_products_first() -> None:
+    cell = _cell()
+    module = Product(
+        "module", "module.com", Quantity(1.0, uc.kg), bom=BoM({cell: ProductInstance(cell, Quantity(1.0, uc.kg))})
+    )
+    order = topological_order([module])
+    assert order.index(uc.nickel) < order.index(cell) < order.index(module)
+
+
+def test_final_bom_is_cached_and_invalidated_on_bom_reassignment() -> None:
+    flattener = BoMFlattener()
+    cell = _cell()
+    pack = Product(
+        "pack", "pack.com", Quantity(2.0, uc.kg), bom=BoM({cell: ProductInstance(cell, Quantity(2.0, uc.kg))})
+    )
+
+    assert flattener.final_bom(pack).product_quantities[uc.nickel].qty.value == pytest.approx(1.0)
+    assert flattener.final_quantities(cell) is flattener.final_quantities(cell)
+
+    cell.bom = BoM({uc.steel: ProductInstance(uc.steel, Quantity(1.0, uc.kg))})
+    final_bom = flattener.final_bom(pack)
+    assert uc.nickel not in final_bom.product_quantities
+    assert final_bom.product_quantities[uc.steel].qty.value == pytest.approx(2.0)
+
+
+def test_cycle_is_detected() -> None:
+    first = Product("first", "first.com", Quantity(1.0, uc.kg))
+    second = Product(
+        "second", "second.com", Quantity(1.0, uc.kg), bom=BoM({first: ProductInstance(first, Quantity(1.0, uc.kg))})
+    )
+    first.bom = BoM({second: ProductInstance(second, Quantity(1.0, uc.kg))})
+    with pytest.raises(ValueError, match="Cycle detected"):
+        first.get_final_bom()
+
+
+def test_bom_change_only_recomputes_the_products_reaching_it() -> None:
+    flattener = BoMFlattener()
+    cell, other_cell = _cell(), _cell()
+    pack = Product(
+        "pack", "pack.com", Quantity(2.0, uc.kg), bom=BoM({cell: ProductInstance(cell, Quantity(2.0, uc.kg))})
+    )
+    other_quantities = flattener.final_quantities(other_cell)
+    flattener.final_quantities(pack)
+
+    cell.bom.set_quantity_of_product("nickel", 0.25)
+    cell.bom.set_quantity_of_product("cobalt", 0.75)
+    assert flattener.final_bom(pack).product_quantities[uc.nickel].qty.value == pytest.approx(0.5)
+    assert flattener.final_quantities(other_cell) is other_quantities
@@ -75,3 +75,40 @@ def test_product_instance_bom() -> None:
 
 test_product_bom()
 test_product_instance_bom()
+
+
+def test_product_instance_bom_is_lazy() -> None:
+    """The scaled BoM of a ProductInstance is only built when accessed, and follows quantity updates."""
+    instance = ProductInstance(cell_nmc_333, Quantity(2.0, uc.kg))
+    assert instance._bom is None
+    assert (instance + Quantity(1.0, uc.kg))._bom is None
+    assert instance.bom.product_quantities[uc.cobalt].qty.value == pytest.approx(0.8)
+    instance.qty = Quantity(1.0, uc.kg)
+    assert instance.bom.product_quantities[uc.cobalt].qty.value == pytest.approx(0.4)
+    assert ProductInstance(uc.nickel, Quantity(1.0, uc.kg)).bom == {}
+
+
+def test_product_instance_bom_follows_product_bom_changes() -> None:
+    """The cached scaled BoM is rebuilt when the product BoM is reassigned or edited after the first access."""
+    cell = Product(
+        "cell", "cell.com", Quantity(1.0, uc.kg), bom=BoM({uc.nickel: ProductInstance(uc.nickel, Quantity(1.0, uc.kg))})
+    )
+    instance = ProductInstance(cell, Quantity(2.0, uc.kg))
+    assert set(instance.bom.product_quantities) == {uc.nickel}
+
+    cell.bom = BoM({uc.cobalt: ProductInstance(uc.cobalt, Quantity(1.0, uc.kg))})
+    assert set(instance.bom.product_quantities) == {uc.cobalt}
+    cell.bom.set_quantity_of_product("cobalt", 0.5)
+    assert instance.bom.product_quantities[uc.cobalt].qty.value == pytest.approx(1.0)
+
+
+def test_bom_membership() -> None:
+    """Membership by name, Product and ProductInstance, also after quantities are updated."""
+    bom = BoM({uc.nickel: ProductInstance(uc.nickel, Quantity(1.0, uc.kg))})
+    bom.set_quantity_of_product("nickel", 0.0)
+    assert "nickel" in bom
+    assert uc.nickel in bom
+    assert ProductInstance(uc.nickel, Quantity(2.0, uc.kg)) in bom
+    assert "cobalt" not in bom
+    assert uc.cobalt not in bom
+    assert 1.0 not in bom
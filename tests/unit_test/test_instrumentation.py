@@ -0,0 +1,42 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.instrumentation import StageTimer, stage_timer
+
+
+def test_update_is_silent_and_timed_on_demand(capsys, caplog) -> None:
+    new_inventory = Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+    r_process = new_inventory.get_process("recycling_process_1")
+
+    stage_timer.reset()
+    r_process.update_fixed_input_lci({"Battery_NMC442": 578.0})
+    assert capsys.readouterr().out == ""
+    assert stage_timer.snapshot() == {}
+
+    stage_timer.enable()
+    try:
+        with caplog.at_level(logging.DEBUG, logger="batterway"):
+            r_process.update_fixed_input_lci({"Battery_NMC442": 578.0})
+    finally:
+        stage_timer.disable()
+    counters = stage_timer.snapshot()
+    stage_timer.reset()
+    assert {"flattening", "relation_application", "bom_construction"} <= set(counters)
+    assert all(c["calls"] >= 1 and c["seconds"] >= 0 for c in counters.values())
+    assert any("Updated output flow of recycling_process_1" in m for m in caplog.messages)
+
+
+def test_stage_timer_counts_concurrent_stages() -> None:
+    def run_stages() -> None:
+        for _ in range(2_000):
+            with timer.measure("flattening"):
+                pass
+
+    timer = StageTimer()
+    timer.enable()
+    with ThreadPoolExecutor(8) as pool:
+        for future in [pool.submit(run_stages) for _ in range(8)]:
+            future.result()
+    assert timer.snapshot()["flattening"]["calls"] == 16_000
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.process import RecyclingProcess, RecyclingRoute
+from batterway.datamodel.generic.product import BoM, ChemicalCompound, Product, ProductInstance, Quantity
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.model.mass_balance import MassBalanceChecker, check_route
+
+cobalt_sulfate = ChemicalCompound("CoSO4", "coso4.com", Quantity(1.0, uc.kg), "CoSO4")
+sulfate = ChemicalCompound("SO4", "so4.com", Quantity(1.0, uc.kg), "SO4")
+sulfur = Product("Sulfur", "s.com", Quantity(1.0, uc.kg))
+oxygen = Product("Oxygen", "o.com", Quantity(1.0, uc.kg))
+cobalt = Product("Cobalt", "co.com", Quantity(1.0, uc.kg))
+black_mass = Product(
+    "black mass",
+    "black_mass.com",
+    Quantity(1.0, uc.kg),
+    bom=BoM({cobalt_sulfate: ProductInstance(cobalt_sulfate, Quantity(1.0, uc.kg))}),
+)
+COBALT_SHARE = 58.933194 / 154.989194
+
+
+def _leaching(cobalt_yield: float = 1.0) -> RecyclingProcess:
+    return RecyclingProcess(
+        "leaching",
+        BoM({black_mass: ProductInstance(black_mass, Quantity(1.0, uc.kg))}),
+        BoM({}),
+        {},
+        {(cobalt_sulfate, cobalt): COBALT_SHARE * cobalt_yield, (cobalt_sulfate, sulfate): 1 - COBALT_SHARE},
+    )
+
+
+def test_process_mass_balance() -> None:
+    feeds = pd.DataFrame({"black mass": [1.0, 10.0, 250.0]})
+    report = MassBalanceChecker(_leaching()).check(feeds)
+    assert report.elements == ["O", "S", "Co"]
+    assert report.balanced.all()
+    np.testing.assert_allclose(report.inflow[:, 2], feeds["black mass"] * COBALT_SHARE)
+
+    lossy_report = MassBalanceChecker(_leaching(cobalt_yield=0.9)).check(feeds)
+    assert not lossy_report.balanced.any()
+    assert lossy_report.to_frame()["Co"].to_numpy() == pytest.approx(-0.1 * feeds["black mass"] * COBALT_SHARE)
+    assert lossy_report.element_balanced[:, :2].all()
+
+
+def test_route_mass_balance_sums_process_imbalances() -> None:
+    # The leaf input SO4 counts twice in the flattened inputs, hence the halved coefficients
+    splitting = RecyclingProcess(
+        "splitting",
+        BoM({sulfate: ProductInstance(sulfate, Quantity(1.0, uc.kg))}),
+        BoM({}),
+        {},
+        {(sulfate, sulfur): 0.5 * sulfate.get_molar_share()["S"], (sulfate, oxygen): 0.4},
+    )
+    route = RecyclingRoute("route", [_leaching(cobalt_yield=0.9), splitting])
+    feeds = np.array([[1.0], [4.0]])
+    reports = check_route(route, feeds)
+    assert list(reports) == ["leaching", "splitting", "route"]
+    assert reports["splitting"].element_balanced[:, 1].all()
+    assert not reports["splitting"].element_balanced[:, 0].any()
+    route_report = reports["route"]
+    for elem in route_report.elements:
+        column = route_report.elements.index(elem)
+        expected = sum(
+            r.imbalance[:, r.elements.index(elem)]
+            for r in (reports["leaching"], reports["splitting"])
+            if elem in r.elements
+        )
+        np.testing.assert_allclose(route_report.imbalance[:, column], expected, atol=1e-12)
+
+
+def test_inventory_mass_balance_reports_unresolved_products() -> None:
+    inventory = Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+    r_process = inventory.get_process("recycling_process_1")
+    report = MassBalanceChecker(r_process).check(pd.DataFrame({"Battery_NMC442": [578.0, 100.0]}))
+    assert report.imbalance.shape == (2, len(report.elements))
+    assert "Electricity" in report.unresolved
+    assert "Co" in report.elements
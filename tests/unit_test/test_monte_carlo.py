@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.model.monte_carlo import _ProcessModel, simulate_final_bom, simulate_process
+
+FEED = {"Battery_NMC442": 578.0, "Nickel": 3.0}
+
+
+def _inventory() -> Inventory:
+    return Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+
+
+def test_zero_uncertainty_matches_evaluation() -> None:
+    r_process = _inventory().get_process("recycling_process_1")
+    result = r_process.evaluate(FEED)
+    samples = simulate_process(r_process, FEED, 4, relation_cv=0.0).samples
+    for flow, bom in (("input", result.computed_input_bom), ("output", result.computed_output_bom)):
+        for product, p_instance in bom.product_quantities.items():
+            assert samples[(flow, product.name)].to_numpy() == pytest.approx(p_instance.qty.value)
+    assert r_process.computed_output_bom is None
+
+
+def test_samples_are_reproducible_across_workers() -> None:
+    r_process = _inventory().get_process("recycling_process_1")
+    kwargs = {"relation_cv": 0.1, "bom_cv": 0.05, "seed": 42, "chunk_size": 250}
+    sequential = simulate_process(r_process, FEED, 1000, **kwargs)
+    parallel = simulate_process(r_process, FEED, 1000, max_workers=2, **kwargs)
+    np.testing.assert_array_equal(sequential.samples.to_numpy(), parallel.samples.to_numpy())
+    assert not np.array_equal(
+        sequential.samples.to_numpy(), simulate_process(r_process, FEED, 1000, **(kwargs | {"seed": 7})).samples
+    )
+
+    summary = sequential.summary()
+    assert list(summary.columns) == ["mean", "std", "p5", "p50", "p95"]
+    assert (summary["p5"] <= summary["p95"]).all()
+
+
+def test_model_is_sent_once_per_worker(monkeypatch) -> None:
+    """Chunk tasks only carry a seed and a size, the model reaches each worker once at most."""
+    pickled = []
+
+    def counting_getstate(model: _ProcessModel) -> dict:
+        pickled.append(model)
+        return model.__dict__
+
+    monkeypatch.setattr(_ProcessModel, "__getstate__", counting_getstate, raising=False)
+    r_process = _inventory().get_process("recycling_process_1")
+    samples = simulate_process(r_process, FEED, 1000, bom_cv=0.05, seed=1, chunk_size=100, max_workers=2).samples
+    assert len(samples) == 1000
+    assert len(pickled) <= 2
+
+
+def test_final_bom_samples() -> None:
+    battery = _inventory().get_product("Battery_NMC442")
+    final_bom = battery.get_final_bom()
+    samples = simulate_final_bom(battery, 2000, bom_cv=0.0, qty=2.0).samples
+    for product, p_instance in final_bom.product_quantities.items():
+        assert samples[("final", product.name)].to_numpy() == pytest.approx(2.0 * p_instance.qty.value)
+
+    summary = simulate_final_bom(battery, 20000, bom_cv=0.05, seed=1).summary()
+    # The multipliers have a mean of 1, so the sampled means stay close to the point estimate
+    for product, p_instance in final_bom.product_quantities.items():
+        assert summary.loc[("final", product.name), "mean"] == pytest.approx(p_instance.qty.value, rel=0.01)
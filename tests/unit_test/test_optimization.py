@@ -0,0 +1,52 @@
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.process import RecyclingProcess
+from batterway.datamodel.generic.product import BoM, ProductInstance, Quantity
+from batterway.model.optimization import FeedMixOptimizer
+
+
+def _smelting() -> RecyclingProcess:
+    # Leaf inputs count twice in the flattened inputs: steel = 2 * (nickel + 3 * cobalt), heat = nickel + 8 * cobalt
+    return RecyclingProcess(
+        "smelting",
+        BoM(
+            {
+                uc.nickel: ProductInstance(uc.nickel, Quantity(1.0, uc.kg)),
+                uc.cobalt: ProductInstance(uc.cobalt, Quantity(1.0, uc.kg)),
+            }
+        ),
+        BoM({}),
+        {(uc.nickel, uc.heat): 0.5, (uc.cobalt, uc.heat): 4.0},
+        {(uc.nickel, uc.steel): 1.0, (uc.cobalt, uc.steel): 3.0},
+    )
+
+
+def test_maximize_recovery_under_reagent_budget() -> None:
+    optimizer = FeedMixOptimizer(_smelting())
+    result = optimizer.solve(
+        {"steel": 1.0}, maximize=True, capacity=10.0, flow_bounds={("input", "heat"): (None, 40.0)}
+    )
+    assert result.success
+    assert result.feed == pytest.approx({"nickel": 40 / 7, "cobalt": 30 / 7})
+    assert result.objective == pytest.approx(260 / 7)
+    assert result.flows[("input", "heat")] == pytest.approx(40.0)
+
+    evaluation = _smelting().evaluate(result.feed)
+    assert evaluation.computed_output_bom.product_quantities[uc.steel].qty.value == pytest.approx(result.objective)
+
+
+def test_minimize_reagent_and_infeasible_problem() -> None:
+    optimizer = FeedMixOptimizer(_smelting())
+    result = optimizer.solve(
+        {("smelting", "input", "heat"): 1.0},
+        flow_bounds={"steel": (12.0, None)},
+        feed_bounds={"cobalt": (1.0, None)},
+    )
+    assert result.feed == pytest.approx({"nickel": 3.0, "cobalt": 1.0})
+    assert result.objective == pytest.approx(11.0)
+
+    infeasible = optimizer.solve({"steel": 1.0}, maximize=True, capacity=1.0, flow_bounds={"steel": (100.0, None)})
+    assert not infeasible.success
+    with pytest.raises(ValueError, match="Unknown flow"):
+        optimizer.solve({"vapor": 1.0})
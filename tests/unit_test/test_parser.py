@@ -1,6 +1,13 @@
+import pickle
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from batterway.datamodel.parser.Inventory import Inventory
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from batterway.datamodel.parser.Inventory import Inventory, iter_relative_lcis
 
 
 def test_parser() -> None:
@@ -11,3 +18,133 @@ def test_parser() -> None:
 
 
 test_parser()
+
+
+def test_snapshot_cache(tmp_path) -> None:
+    """A second load with unchanged files comes from the snapshot, a changed file invalidates it."""
+    data_dir = tmp_path / "data"
+    shutil.copytree(Path(__file__).parent.parent.parent / "data/dataframes/", data_dir)
+    cache_dir = tmp_path / "cache"
+
+    first = Inventory.create_from_file(data_dir, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.pkl"))) == 1
+    second = Inventory.create_from_file(data_dir, cache_dir=cache_dir)
+    assert second.products.keys() == first.products.keys()
+    r_process = second.get_process("recycling_process_1")
+    r_process.update_fixed_input_lci({"Battery_NMC442": 578.0})
+    first.get_process("recycling_process_1").update_fixed_input_lci({"Battery_NMC442": 578.0})
+    assert {p.name: pi.qty.value for p, pi in r_process.computed_output_bom.product_quantities.items()} == {
+        p.name: pi.qty.value
+        for p, pi in first.get_process("recycling_process_1").computed_output_bom.product_quantities.items()
+    }
+
+    with data_dir.joinpath("units.csv").open("a") as f:
+        f.write("\n")
+    Inventory.create_from_file(data_dir, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+
+def test_columnar_validation_errors(tmp_path) -> None:
+    """Invalid values and unknown references are reported per table and column."""
+    data_dir = tmp_path / "data"
+    shutil.copytree(Path(__file__).parent.parent.parent / "data/dataframes/", data_dir)
+    bom_file = data_dir / "BoM.csv"
+    original_bom = bom_file.read_text()
+
+    bom_file.write_text(original_bom + "Battery_NMC622;Unobtainium;0.1;kg\n")
+    with pytest.raises(ValueError, match="Unknown Material in BoM.csv: \\['Unobtainium'\\]"):
+        Inventory.create_from_file(data_dir)
+
+    bom_file.write_text(original_bom + "Battery_NMC622;Steel;a lot;kg\n")
+    with pytest.raises(ValidationError):
+        Inventory.create_from_file(data_dir)
+
+
+def test_lazy_inventory_builds_only_requested_process() -> None:
+    """A lazy inventory builds a process and its product closure on first request, with the same results."""
+    data_dir = Path(__file__).parent.parent.parent / "data/dataframes/"
+    lazy_inventory = Inventory.open_lazy(data_dir)
+    assert lazy_inventory.products == {}
+    assert lazy_inventory.process_lcis == {}
+    assert lazy_inventory.tables.relative_lcis == {}
+    assert list(lazy_inventory.tables.relative_lci_blocks) == ["route1", "route2", "route3"]
+
+    r_process = lazy_inventory.get_process("recycling_process_1")
+    assert list(lazy_inventory.process_lcis) == ["recycling_process_1"]
+    assert list(lazy_inventory.tables.relative_lcis) == ["route1"]
+    assert "Battery_NMC442" in lazy_inventory.products
+    assert "Aluminium" in lazy_inventory.products  # Reached through the battery BoMs
+    assert "Alloy" not in lazy_inventory.products
+    assert lazy_inventory.get_process("recycling_process_1") is r_process
+    # Each relative LCI is read at its indexed offset, with the same relations as when streaming the whole file
+    for block in iter_relative_lcis(data_dir / "lci_relative.csv"):
+        relative_lci = lazy_inventory.tables.read_relative_lci(block.lci_id)
+        assert relative_lci.relative_lci_input == block.relative_lci_input
+        assert relative_lci.relative_lci_output == block.relative_lci_output
+
+    eager_process = Inventory.create_from_file(data_dir).get_process("recycling_process_1")
+    for process in (r_process, eager_process):
+        process.update_fixed_input_lci({"Battery_NMC442": 578.0})
+    assert {p.name: pi.qty.value for p, pi in r_process.computed_output_bom.product_quantities.items()} == {
+        p.name: pi.qty.value for p, pi in eager_process.computed_output_bom.product_quantities.items()
+    }
+
+
+def test_lazy_inventory_shared_by_threads() -> None:
+    """Threads requesting processes of one lazy inventory at once share a single object per product."""
+    data_dir = Path(__file__).parent.parent.parent / "data/dataframes/"
+    for _ in range(5):
+        lazy_inventory = Inventory.open_lazy(data_dir)
+        names = ["recycling_process_1", "recycling_process_2"] * 4
+        with ThreadPoolExecutor(len(names)) as pool:
+            processes = list(pool.map(lazy_inventory.get_process, names))
+        assert all(process is lazy_inventory.get_process(name) for name, process in zip(names, processes))
+        for process in processes:
+            for product in process.inputs.product_quantities:
+                assert lazy_inventory.products[product.name] is product
+                for material in product.bom.product_quantities if product.bom is not None else ():
+                    assert lazy_inventory.products[material.name] is material
+
+
+def test_streamed_relative_lcis(tmp_path) -> None:
+    """Reading lci_relative.csv in small chunks yields one block per lci_id and builds the same processes."""
+    data_dir = tmp_path / "dataframes"
+    shutil.copytree(Path(__file__).parent.parent.parent / "data/dataframes/", data_dir)
+    lci_file = data_dir / "lci_relative.csv"
+
+    blocks = list(iter_relative_lcis(lci_file, chunksize=3))
+    assert [block.lci_id for block in blocks] == ["route1", "route2", "route3"]
+    lci_table = pd.read_csv(lci_file, sep=";")
+    assert sum(len(b.relative_lci_input) + len(b.relative_lci_output) for b in blocks) == len(lci_table)
+
+    streamed_process = Inventory.create_from_file(data_dir, chunksize=3).get_process("recycling_process_2")
+    eager_process = Inventory.create_from_file(data_dir).get_process("recycling_process_2")
+    for process in (streamed_process, eager_process):
+        process.update_fixed_input_lci({"Battery_NMC442": 578.0})
+    assert {p.name: pi.qty.value for p, pi in streamed_process.computed_output_bom.product_quantities.items()} == {
+        p.name: pi.qty.value for p, pi in eager_process.computed_output_bom.product_quantities.items()
+    }
+
+    pd.concat([lci_table, lci_table.iloc[:1]]).to_csv(lci_file, sep=";", index=False)
+    with pytest.raises(ValueError, match="not contiguous"):
+        list(iter_relative_lcis(lci_file, chunksize=3))
+    # Interleaved lci_ids are rejected even when they fall within a single chunk
+    route1 = lci_table[lci_table["lci_id"] == "route1"]
+    pd.concat([route1.iloc[:2], lci_table[lci_table["lci_id"] == "route2"].iloc[:1], route1.iloc[2:]]).to_csv(
+        lci_file, sep=";", index=False
+    )
+    with pytest.raises(ValueError, match="Rows of route1 are not contiguous"):
+        list(iter_relative_lcis(lci_file, chunksize=len(lci_table)))
+    with pytest.raises(ValueError, match="Rows of route1 are not contiguous"):
+        Inventory.open_lazy(data_dir)
+
+
+def test_failed_snapshot_leaves_no_temporary_file(tmp_path, monkeypatch) -> None:
+    def failing_dump(*args, **kwargs):
+        raise pickle.PicklingError("disk full")
+
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(pickle, "dump", failing_dump)
+    with pytest.raises(pickle.PicklingError):
+        Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/", cache_dir=cache_dir)
+    assert list(cache_dir.iterdir()) == []
@@ -0,0 +1,113 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from batterway.datamodel.generic.product import BoM, Product, Quantity
+from batterway.datamodel.parser.Inventory import Inventory
+
+SAMPLE_DATA = Path(__file__).parent.parent.parent / "data/dataframes"
+
+
+@pytest.fixture
+def sample_inventory() -> Inventory:
+    """A freshly loaded sample inventory, so that tests updating its processes stay independent."""
+    return Inventory.create_from_file(SAMPLE_DATA)
+
+
+def test_compiled_relations_match_relation_dicts(sample_inventory: Inventory) -> None:
+    """The compiled relation matrices give the same flows as applying each relation to the final input BoM."""
+    r_process = sample_inventory.get_process("recycling_process_1")
+    r_process.update_fixed_input_lci({"Battery_NMC442": 578.0, "Nickel": 3.0})
+
+    battery = sample_inventory.products["Battery_NMC442"]
+    nickel = sample_inventory.products["Nickel"]
+    final_bom = {p: pi.qty.value for p, pi in battery.get_final_bom().product_quantities.items()}
+    final_bom = {p: qty * 578.0 for p, qty in final_bom.items()}
+    final_bom[nickel] += 2 * 3.0  # Leaf inputs are part of both the flattened inputs and the inputs themselves
+    final_bom[battery] = 578.0
+    for relations, computed_bom in (
+        (r_process.ref_input_to_input_relation, r_process.computed_input_bom),
+        (r_process.ref_input_to_output_relation, r_process.computed_output_bom),
+    ):
+        expected = {}
+        for (influencing, influenced), ratio in relations.items():
+            if influencing in final_bom:
+                expected[influenced] = expected.get(influenced, 0.0) + final_bom[influencing] * ratio
+        assert set(computed_bom.product_quantities) == set(expected)
+        for product, qty in expected.items():
+            assert computed_bom.product_quantities[product].qty.value == pytest.approx(qty)
+
+
+def test_evaluate_batch_matches_single_updates(sample_inventory: Inventory) -> None:
+    """Each row of a batch evaluation equals update_fixed_input_lci on the same feed, and the process is untouched."""
+    r_process = sample_inventory.get_process("recycling_process_2")
+    feeds = pd.DataFrame(
+        {"Battery_NMC442": [578.0, 0.0, 10.0], "Battery_NMC111": [0.0, 5.0, 10.0], "Cobalt": [0.0, 1.0, 0.5]}
+    )
+    input_flows, output_flows = r_process.evaluate_batch(feeds)
+    assert r_process.computed_output_bom is None
+    assert input_flows.shape[0] == output_flows.shape[0] == 3
+
+    for scenario, feed in feeds.iterrows():
+        r_process.update_fixed_input_lci({name: qty for name, qty in feed.items() if qty})
+        for flows, computed_bom in (
+            (input_flows, r_process.computed_input_bom),
+            (output_flows, r_process.computed_output_bom),
+        ):
+            for product, p_instance in computed_bom.product_quantities.items():
+                assert flows.loc[scenario, product.name] == p_instance.qty.value
+
+
+def test_concurrent_evaluation_leaves_process_unchanged(sample_inventory: Inventory) -> None:
+    """evaluate returns its flows in a result object, so threads can share one process."""
+    r_process = sample_inventory.get_process("recycling_process_1")
+    initial_inputs = {p.name: pi.qty.value for p, pi in r_process.inputs.product_quantities.items()}
+    feeds = [{"Battery_NMC442": 100.0 * (i + 1), "Nickel": float(i)} for i in range(16)]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(r_process.evaluate, feeds))
+    assert r_process.computed_output_bom is None
+    assert {p.name: pi.qty.value for p, pi in r_process.inputs.product_quantities.items()} == initial_inputs
+
+    for feed, result in zip(feeds, results):
+        r_process.update_fixed_input_lci(feed)
+        assert {p.name: pi.qty.value for p, pi in result.computed_output_bom.product_quantities.items()} == {
+            p.name: pi.qty.value for p, pi in r_process.computed_output_bom.product_quantities.items()
+        }
+        assert result.inputs.product_quantities[sample_inventory.get_product("Nickel")].qty.value == feed["Nickel"]
+
+
+def test_process_jacobian_matches_evaluation(sample_inventory: Inventory) -> None:
+    r_process = sample_inventory.get_process("recycling_process_2")
+    jacobian = r_process.jacobian()
+    feed = {"Battery_NMC442": 578.0, "Battery_NMC111": 20.0, "Cobalt": 2.5}
+    feed_vector = [feed.get(p.name, 0.0) for p in jacobian.fixed_inputs]
+    result = r_process.evaluate(feed)
+    to_input, to_output = jacobian.to_frames()
+    for table, matrix, bom in (
+        (to_input, jacobian.to_input, result.computed_input_bom),
+        (to_output, jacobian.to_output, result.computed_output_bom),
+    ):
+        flows = dict(zip(table.index, matrix @ feed_vector))
+        for product, p_instance in bom.product_quantities.items():
+            assert flows[product.name] == pytest.approx(p_instance.qty.value, rel=1e-6, abs=1e-6)
+
+
+def test_compiled_relations_follow_the_boms_they_use(sample_inventory: Inventory) -> None:
+    """Compiled relations survive BoM changes elsewhere and pickling, and are recompiled when an input BoM changes."""
+    r_process = sample_inventory.get_process("recycling_process_1")
+    compiled = r_process.compiled_relations
+    outside = Product("outside", "https://example.com/outside", Quantity(1.0, sample_inventory.units["kg"]))
+    outside.bom = BoM({})
+    assert r_process.compiled_relations is compiled
+
+    unpickled = pickle.loads(pickle.dumps(r_process))
+    unpickled_compiled = unpickled.compiled_relations
+    assert unpickled_compiled.revisions != compiled.revisions
+    assert unpickled.compiled_relations is unpickled_compiled
+
+    battery = sample_inventory.products["Battery_NMC442"]
+    battery.bom = battery.bom
+    assert r_process.compiled_relations is not compiled
@@ -0,0 +1,86 @@
+import pickle
+from pathlib import Path
+
+import pytest
+from sentier_data_tools.iri import ProductIRI, UnitIRI
+
+from batterway.datamodel.generic.product import (
+    BoM,
+    ChemicalCompound,
+    Product,
+    ProductInstance,
+    Quantity,
+    QuantityVector,
+    Unit,
+)
+from batterway.datamodel.parser.Inventory import Inventory
+
+SAMPLE_DATA = Path(__file__).parent.parent.parent / "data/dataframes"
+
+
+def test_objects_have_no_instance_dict():
+    kg = Unit.intern("kg", "kg_IRI")
+    product = Product("steel", "steel_IRI", Quantity(1.0, kg))
+    compound = ChemicalCompound("nickel", "nickel_IRI", Quantity(1.0, kg), "Ni")
+    for obj in (kg, Quantity(1.0, kg), product, compound, ProductInstance(product, Quantity(2.0, kg))):
+        assert not hasattr(obj, "__dict__")
+
+
+def test_units_are_interned_and_immutable():
+    kg = Unit.intern("kg", "kg_IRI")
+    assert Unit.intern("kg", "kg_IRI") is kg
+    assert Unit.intern("kg", "other_IRI") is not kg
+    assert pickle.loads(pickle.dumps(kg)) is kg
+    with pytest.raises(AttributeError, match="immutable"):
+        kg.name = "g"
+
+    first = Inventory.create_from_file(SAMPLE_DATA)
+    second = Inventory.create_from_file(SAMPLE_DATA)
+    assert first.units["kg"] is second.units["kg"]
+    assert first.products["Alloy"].reference_quantity.unit is second.products["Alloy"].reference_quantity.unit
+
+
+def test_iris_are_built_on_first_access():
+    kg = Unit("kg", "kg_IRI")
+    product = Product("steel", "steel_IRI", Quantity(1.0, kg))
+    assert isinstance(product.iri, ProductIRI) and str(product.iri) == "steel_IRI"
+    assert product.iri is product.iri
+    assert isinstance(kg.iri, UnitIRI) and str(kg.iri) == "kg_IRI"
+    restored = pickle.loads(pickle.dumps(product))
+    assert restored.name == "steel" and str(restored.iri) == "steel_IRI"
+
+
+def test_quantity_vector_arithmetic():
+    kg = Unit.intern("kg", "kg_IRI")
+    kwh = Unit.intern("kWh", "kWh_IRI")
+    a = QuantityVector([1.0, 2.0, 3.0], kg)
+    b = QuantityVector.from_quantities([Quantity(1.0, kg), Quantity(0.5, kg), Quantity(0.0, kg)])
+    assert (a + b).values.tolist() == [2.0, 2.5, 3.0]
+    assert (a - Quantity(1.0, kg)).values.tolist() == [0.0, 1.0, 2.0]
+    assert (2 * a).values.tolist() == [2.0, 4.0, 6.0]
+    assert (a > b).tolist() == [False, True, True]
+    assert a.sum() == Quantity(6.0, kg)
+    assert a[1] == Quantity(2.0, kg)
+    assert a[1:] == QuantityVector([2.0, 3.0], kg)
+    with pytest.raises(ValueError, match="not compatible"):
+        a + QuantityVector([1.0, 1.0, 1.0], kwh)
+    with pytest.raises(ValueError, match="cannot form a vector"):
+        QuantityVector.from_quantities([Quantity(1.0, kg), Quantity(1.0, kwh)])
+
+
+def test_bom_from_vector_builds_instances_on_access():
+    kg = Unit.intern("kg", "kg_IRI")
+    steel = Product("steel", "steel_IRI", Quantity(1.0, kg))
+    copper = Product("copper", "copper_IRI", Quantity(1.0, kg))
+    bom = BoM.from_vector([steel, copper], QuantityVector([2.0, 3.0], kg))
+    assert bom.quantity_total == 5.0
+    assert "steel" in bom and copper in bom
+    assert (bom * 2).to_vector() == QuantityVector([4.0, 6.0], kg)
+    assert {p.name: pi.qty.value for p, pi in bom.product_quantities.items()} == {"steel": 2.0, "copper": 3.0}
+    bom.set_quantity_of_product("steel", 1.0)
+    assert bom.to_vector() == QuantityVector([1.0, 3.0], kg)
+    assert bom.quantity_total == 4.0
+
+    eager = BoM({steel: ProductInstance(steel, Quantity(2.0, kg)), copper: ProductInstance(copper, Quantity(3.0, kg))})
+    assert eager.to_vector() == bom.to_vector() + QuantityVector([1.0, 0.0], kg)
+    assert (eager * Quantity(0.5, kg)).quantity_values().tolist() == [1.0, 1.5]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.process import RecyclingProcess, RecyclingRoute
+from batterway.datamodel.generic.product import BoM, ProductInstance, Quantity
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.model.route_executor import RouteExecutor
+
+
+def _inventory() -> Inventory:
+    shredding = RecyclingProcess(
+        "shredding",
+        BoM({uc.nmc111: ProductInstance(uc.nmc111, Quantity(1.0, uc.kg))}),
+        BoM({}),
+        {(uc.nmc111, uc.heat): 0.2},
+        {(uc.nickel, uc.steel): 0.9, (uc.cobalt, uc.water): 0.5},
+    )
+    refining = RecyclingProcess(
+        "refining",
+        BoM({uc.steel: ProductInstance(uc.steel, Quantity(1.0, uc.kg))}),
+        BoM({}),
+        {(uc.steel, uc.heat): 2.0},
+        {(uc.steel, uc.vapor): 0.5},
+    )
+    return Inventory({"kg": uc.kg}, {}, {"shredding": shredding, "refining": refining})
+
+
+def test_route_run_chains_outputs() -> None:
+    inventory = _inventory()
+    route = RecyclingRoute("route", [inventory.get_process("shredding"), inventory.get_process("refining")])
+    shredding, refining = route.run({"nmc111": 10.0})
+    assert refining.inputs.product_quantities[uc.steel].qty.value == pytest.approx(2.7)
+    # steel has no BoM, so it counts both as an input and as its own final BoM
+    assert refining.computed_output_bom.product_quantities[uc.vapor].qty.value == pytest.approx(2 * 2.7 * 0.5)
+    assert inventory.get_process("refining").computed_output_bom is None
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_route_executor_matches_sequential_run(start_method) -> None:
+    scenarios = pd.DataFrame({"nmc111": [1.0, 2.0, 5.0, 10.0, 0.5]}, index=list("abcde"))
+    sequential = RouteExecutor(_inventory(), ["shredding", "refining"], max_workers=1).run(scenarios)
+    parallel = RouteExecutor(_inventory(), ["shredding", "refining"], max_workers=2, start_method=start_method).run(
+        scenarios, chunksize=2
+    )
+    pd.testing.assert_frame_equal(sequential, parallel)
+    assert list(sequential.index) == list("abcde")
+    assert sequential.loc["e", ("refining", "vapor")] == pytest.approx(2 * 0.5 * 0.3 * 0.9 * 0.5)
+
+
+def test_route_jacobian_matches_run() -> None:
+    inventory = _inventory()
+    route = RecyclingRoute("route", [inventory.get_process("shredding"), inventory.get_process("refining")])
+    shredding, refining = route.jacobian()
+    assert [p.name for p in refining.fixed_inputs] == ["nmc111"]
+    feed = np.array([10.0])
+    for jacobian, result in zip((shredding, refining), route.run({"nmc111": 10.0})):
+        for products, matrix, bom in (
+            (jacobian.input_influenced, jacobian.to_input, result.computed_input_bom),
+            (jacobian.output_influenced, jacobian.to_output, result.computed_output_bom),
+        ):
+            assert dict(zip([p.name for p in products], matrix @ feed)) == pytest.approx(
+                {p.name: pi.qty.value for p, pi in bom.product_quantities.items()}
+            )
+    _, to_output = refining.to_frames()
+    assert to_output.loc["vapor", "nmc111"] == pytest.approx(2 * 0.3 * 0.9 * 0.5)
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import tests.unit_test.utils_common as uc
+from batterway.datamodel.generic.process import RecyclingProcess
+from batterway.datamodel.generic.product import BoM, ProductInstance, Quantity
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.model.sensitivity import one_at_a_time, sobol_indices
+
+
+def _smelting() -> RecyclingProcess:
+    return RecyclingProcess(
+        "smelting",
+        BoM(
+            {
+                uc.nickel: ProductInstance(uc.nickel, Quantity(1.0, uc.kg)),
+                uc.cobalt: ProductInstance(uc.cobalt, Quantity(1.0, uc.kg)),
+            }
+        ),
+        BoM({}),
+        {},
+        {(uc.nickel, uc.steel): 1.0, (uc.cobalt, uc.steel): 3.0},
+    )
+
+
+def test_sobol_indices_of_additive_model() -> None:
+    # steel = 2 * (nickel + 3 * cobalt), so the shares of variance are 1/10 and 9/10
+    result = sobol_indices(_smelting(), {"nickel": 1.0, "cobalt": 1.0}, n_samples=4096, include_ratios=False, seed=0)
+    assert result.n_evaluations == 4096 * 4
+    assert result.first_order.loc["steel"].to_numpy() == pytest.approx([0.1, 0.9], abs=0.02)
+    assert result.total_order.loc["steel"].to_numpy() == pytest.approx([0.1, 0.9], abs=0.02)
+
+
+def test_one_at_a_time() -> None:
+    table = one_at_a_time(_smelting(), {"nickel": 1.0, "cobalt": 1.0})
+    assert list(table.columns) == ["nickel", "cobalt", "nickel -> steel", "cobalt -> steel"]
+    assert table.loc["steel"].to_numpy() == pytest.approx([0.1, 0.3, 0.1, 0.3])
+
+
+def test_sobol_indices_on_inventory_process() -> None:
+    inventory = Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+    r_process = inventory.get_process("recycling_process_1")
+    result = sobol_indices(r_process, {"Battery_NMC442": 578.0, "Nickel": 3.0}, n_samples=256, seed=1)
+    assert result.first_order.shape == result.total_order.shape
+    assert np.nanmax(result.total_order.sum(axis=1)) > 0.9
+    assert r_process.computed_output_bom is None
@@ -0,0 +1,45 @@
+import filecmp
+
+import pandas as pd
+import pytest
+
+from batterway.datamodel.generic.product import ChemicalCompound
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.datamodel.parser.synthetic import write_inventory
+
+
+def test_synthetic_inventory_is_reproducible(tmp_path):
+    write_inventory(tmp_path / "a", n_routes=2, seed=3)
+    write_inventory(tmp_path / "b", n_routes=2, seed=3)
+    write_inventory(tmp_path / "c", n_routes=2, seed=4)
+    assert all(filecmp.cmp(tmp_path / "a" / f, tmp_path / "b" / f, shallow=False) for f in Inventory.SOURCE_FILES)
+    assert not filecmp.cmp(tmp_path / "a" / "BoM.csv", tmp_path / "c" / "BoM.csv", shallow=False)
+
+
+def test_synthetic_inventory_loads(tmp_path):
+    folder = write_inventory(tmp_path, n_raw=20, n_per_level=10, depth=4, width=4, n_routes=3, relation_density=0.2)
+    inventory = Inventory.create_from_file(folder)
+    assert len(inventory.products) == 20 + 4 * 10
+    assert sum(isinstance(p, ChemicalCompound) for p in inventory.products.values()) == 20
+    assert list(inventory.process_lcis) == ["recycling_process_1", "recycling_process_2", "recycling_process_3"]
+    # The relative LCIs are grouped by route, so they can be streamed
+    streamed = Inventory.create_from_file(folder, chunksize=50)
+    assert list(streamed.process_lcis) == list(inventory.process_lcis)
+    result = inventory.get_process("recycling_process_1").evaluate({"level3_0": 10.0})
+    assert len(result.computed_output_bom.product_quantities)
+
+    boms = pd.read_csv(folder / "BoM.csv", sep=";")
+    assert (boms.groupby("BoMId").size() == 4).all()
+    assert boms.groupby("BoMId")["Quantity"].sum().to_numpy() == pytest.approx(1.0)
+
+
+def test_synthetic_inventory_sharing(tmp_path):
+    # 10 parents of 2 entries can be built from 40 distinct lower level products without any sharing
+    write_inventory(tmp_path / "tree", n_raw=40, n_per_level=10, depth=1, width=2, sharing=0.0)
+    write_inventory(tmp_path / "shared", n_raw=40, n_per_level=10, depth=1, width=2, sharing=1.0)
+    tree = pd.read_csv(tmp_path / "tree" / "BoM.csv", sep=";")
+    shared = pd.read_csv(tmp_path / "shared" / "BoM.csv", sep=";")
+    assert tree["Material"].is_unique
+    assert shared["Material"].nunique() < len(shared)
+    with pytest.raises(ValueError, match="sharing"):
+        write_inventory(tmp_path / "invalid", sharing=1.5)
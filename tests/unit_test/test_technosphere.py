@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from batterway.datamodel.generic.product import ProductInstance, Quantity
+from batterway.datamodel.generic.technosphere import Technosphere
+from batterway.datamodel.parser.Inventory import Inventory
+from tests.unit_test.test_get_final_bom import battery_instance, battery_nmc_333
+
+
+def _as_dict(bom) -> dict:
+    return {p.name: pi.qty.value for p, pi in bom.product_quantities.items()}
+
+
+@pytest.mark.parametrize("method", ["solve", "series"])
+def test_technosphere_reproduces_get_final_bom(method) -> None:
+    technosphere = Technosphere([battery_nmc_333])
+    for item in (battery_nmc_333, battery_instance):
+        expected = _as_dict(item.get_final_bom())
+        result = _as_dict(technosphere.final_bom(item, method=method))
+        assert result.keys() == expected.keys()
+        for name, value in expected.items():
+            assert result[name] == pytest.approx(value)
+
+
+def test_inventory_technosphere_batch() -> None:
+    inventory = Inventory.create_from_file(Path(__file__).parent.parent.parent / "data/dataframes/")
+    technosphere = inventory.get_technosphere()
+    demands = [{"Battery_NMC442": 578.0}, {"Battery_NMC111": 2.0, "Nickel": 1.0}]
+    final_boms = technosphere.final_boms(technosphere.demand_matrix(demands))
+    assert final_boms.shape == (len(technosphere.raw_products), 2)
+
+    battery = inventory.products["Battery_NMC442"]
+    expected = ProductInstance(battery, Quantity(578.0, battery.reference_quantity.unit)).get_final_bom()
+    result = technosphere.to_bom(final_boms[:, 0])
+    for product, p_instance in expected.product_quantities.items():
+        assert result.product_quantities[product].qty.value == pytest.approx(p_instance.qty.value)
+    nickel = inventory.products["Nickel"]
+    nickel_per_nmc111 = inventory.products["Battery_NMC111"].bom.product_quantities[nickel].qty.value
+    assert final_boms[technosphere.raw_products.index(nickel), 1] == pytest.approx(1.0 + 2.0 * nickel_per_nmc111)
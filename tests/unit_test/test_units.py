@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batterway.datamodel.generic.product import Quantity, QuantityVector, Unit
+from batterway.datamodel.generic.units import SIMAPRO_UNIT_IRI, UnitRegistry, default_registry
+from batterway.datamodel.parser.Inventory import Inventory
+from batterway.datamodel.parser.synthetic import write_inventory
+
+
+def test_registry_factors():
+    registry = UnitRegistry({"iri:kg": ("mass", 1.0), "iri:t": ("mass", 1000.0), "iri:kWh": ("energy", 1.0)})
+    kg, t, kwh = Unit.intern("kg", "iri:kg"), Unit.intern("t", "iri:t"), Unit.intern("kWh", "iri:kWh")
+    assert registry.table("mass") == pytest.approx(np.array([[1.0, 1e-3], [1e3, 1.0]]))
+    assert registry.factors([t, kg, kg, kwh], [kg, t, kg, kwh]).tolist() == [1000.0, 0.001, 1.0, 1.0]
+    assert registry.convert(Quantity(2.0, t), kg) == Quantity(2000.0, kg)
+    assert registry.convert(QuantityVector([1.0, 2.0], kg), t) == QuantityVector([0.001, 0.002], t)
+    # Unregistered units only convert to themselves
+    other = Unit.intern("piece", "iri:piece")
+    assert registry.factor(other, other) == 1.0
+    with pytest.raises(ValueError, match="Cannot convert"):
+        registry.factors([kg, other], [kwh, kg])
+
+    registry.register("iri:t", "mass", 1000.0)
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register("iri:t", "mass", 907.0)
+
+
+def test_mixed_unit_boms_are_normalized_at_load(tmp_path):
+    reference = Inventory.create_from_file(write_inventory(tmp_path / "kg", n_raw=10, n_per_level=5, width=3))
+    folder = write_inventory(tmp_path / "mixed", n_raw=10, n_per_level=5, width=3)
+    units = pd.read_csv(folder / "units.csv", sep=";")
+    units = pd.concat([units, pd.DataFrame({"name": ["g"], "iri": [f"{SIMAPRO_UNIT_IRI}g"]})])
+    units.to_csv(folder / "units.csv", sep=";", index=False)
+    boms = pd.read_csv(folder / "BoM.csv", sep=";")
+    in_grams = boms.index % 2 == 0
+    boms.loc[in_grams, "Quantity"] *= 1000
+    boms.loc[in_grams, "Unit"] = "g"
+    boms.to_csv(folder / "BoM.csv", sep=";", index=False)
+
+    mixed = Inventory.create_from_file(folder)
+    kg = mixed.units["kg"]
+    for name, product in mixed.products.items():
+        if product.bom is not None:
+            assert all(p_instance.qty.unit is kg for p_instance in product.bom.product_quantities.values())
+            expected = reference.products[name].bom.to_vector()
+            assert product.bom.to_vector().values == pytest.approx(expected.values)
+
+    boms.loc[0, "Unit"] = "kWh"
+    units = pd.concat([units, pd.DataFrame({"name": ["kWh"], "iri": [f"{SIMAPRO_UNIT_IRI}kWh"]})])
+    units.to_csv(folder / "units.csv", sep=";", index=False)
+    boms.to_csv(folder / "BoM.csv", sep=";", index=False)
+    with pytest.raises(ValueError, match="Invalid BoM.csv units"):
+        Inventory.create_from_file(folder)
+
+
+def write_units(folder, names, iris, dimensions, factors):
+    pd.DataFrame({"name": names, "iri": iris, "dimension": dimensions, "factor": factors}).to_csv(
+        folder / "units.csv", sep=";", index=False
+    )
+
+
+def test_units_csv_declares_conversions(tmp_path):
+    folder = write_inventory(tmp_path / "lb", n_raw=5, n_per_level=3, width=2)
+    lb_iri = "https://example.com/unit/lb"
+    write_units(folder, ["kg", "lb"], [f"{SIMAPRO_UNIT_IRI}kg", lb_iri], ["mass", "mass"], [1.0, 0.45359237])
+    inventory = Inventory.create_from_file(folder, cache_dir=tmp_path / "cache")
+    assert inventory.unit_registry.factor(inventory.units["lb"], inventory.units["kg"]) == pytest.approx(0.45359237)
+    assert lb_iri not in default_registry
+    # The registry is part of the snapshot
+    cached = Inventory.create_from_file(folder, cache_dir=tmp_path / "cache")
+    assert cached.unit_registry.factor(cached.units["lb"], cached.units["kg"]) == pytest.approx(0.45359237)
+
+    # Each inventory keeps its own conversions, whatever the load order
+    rounded = write_inventory(tmp_path / "rounded", n_raw=5, n_per_level=3, width=2)
+    write_units(rounded, ["kg", "lb"], [f"{SIMAPRO_UNIT_IRI}kg", lb_iri], ["mass", "mass"], [1.0, 0.45])
+    rounded_inventory = Inventory.create_from_file(rounded)
+    assert rounded_inventory.unit_registry.factor(
+        rounded_inventory.units["lb"], rounded_inventory.units["kg"]
+    ) == pytest.approx(0.45)
+    assert inventory.unit_registry.factor(inventory.units["lb"], inventory.units["kg"]) == pytest.approx(0.45359237)
+
+
+def test_units_csv_sets_the_base_unit(tmp_path):
+    folder = write_inventory(tmp_path, n_raw=5, n_per_level=3, width=2)
+    write_units(
+        folder,
+        ["kg", "MJ", "kWh"],
+        [f"{SIMAPRO_UNIT_IRI}kg", f"{SIMAPRO_UNIT_IRI}MJ", f"{SIMAPRO_UNIT_IRI}kWh"],
+        ["mass", "energy", None],
+        [1.0, 1.0, None],
+    )
+    inventory = Inventory.create_from_file(folder)
+    mj, kwh = inventory.units["MJ"], inventory.units["kWh"]
+    wh = Unit.intern("Wh", f"{SIMAPRO_UNIT_IRI}Wh")
+    # The other default energy units are rescaled to the declared MJ base
+    assert inventory.unit_registry.factors([kwh, wh], [mj, mj]) == pytest.approx([3.6, 3.6e-3])
+
+    write_units(
+        folder,
+        ["kg", "MJ", "kWh"],
+        [f"{SIMAPRO_UNIT_IRI}kg", f"{SIMAPRO_UNIT_IRI}MJ", f"{SIMAPRO_UNIT_IRI}kWh"],
+        ["mass", "energy", "energy"],
+        [1.0, 1.0, 3.0],
+    )
+    with pytest.raises(ValueError, match="already registered"):
+        Inventory.create_from_file(folder)